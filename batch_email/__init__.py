@@ -0,0 +1,3 @@
+"""
+Shared helpers for the batch email scripts (import jobs, storage, CSV handling).
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from batch_email.cli import main
+
+sys.exit(main())
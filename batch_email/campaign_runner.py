@@ -0,0 +1,150 @@
+"""
+Campaign Queue Runner
+--------------------
+Schedule campaigns in the subscriber database and send them with one long-running
+process that shares a single SMTP connection and rate budget between them.
+
+Transactional campaigns (--transactional) preempt bulk ones: the runner
+re-evaluates priorities after every slice of rows.
+
+SMTP settings come from the environment: SMTP_SERVER, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD.
+"""
+
+import argparse
+import logging
+import os
+import signal
+from datetime import datetime
+from typing import List
+
+from batch_email.campaigns import (
+    DEFAULT_DELAY, DEFAULT_POLL_INTERVAL, DEFAULT_RETRY_DELAY, DEFAULT_SLICE_SIZE, PRIORITY_BULK,
+    PRIORITY_TRANSACTIONAL, CampaignQueue, CampaignRunner
+)
+from batch_email.migrations import DEFAULT_DB_PATH
+from batch_email.render import read_template
+
+
+def add_campaign(queue, args):
+    """Schedule a campaign from the command line arguments"""
+    if args.priority is not None:
+        priority = args.priority
+    else:
+        priority = PRIORITY_TRANSACTIONAL if args.transactional else PRIORITY_BULK
+
+    campaign_id = queue.add(
+        csv_path=args.csv,
+        html_template=read_template(args.html),
+        text_template=read_template(args.text),
+        subject_template=args.subject,
+        name=args.name,
+        priority=priority,
+        start_at=datetime.fromisoformat(args.start) if args.start else None,
+        rate_limit=args.rate,
+        use_bcc=not args.individual,
+        batch_size=args.batch_size,
+        check_unsubscribed=not args.no_check_unsubscribed,
+        dedupe=not args.no_dedupe,
+        validate=not args.no_validate
+    )
+    print(f"Scheduled campaign {campaign_id}")
+
+
+def list_campaigns(queue, limit):
+    """Print the most recent campaigns"""
+    campaigns = queue.list_campaigns(limit)
+    if not campaigns:
+        print("No campaigns")
+        return
+
+    for campaign in campaigns:
+        print(f"{campaign['id']}  {campaign['status']:<10} priority {campaign['priority']:<4} "
+              f"rows {campaign['rows_done']:<8} sent {campaign['sent']:<8} failed {campaign['failed']:<6} "
+              f"skipped {campaign['skipped']:<6} {campaign['name']}")
+
+
+def run(queue, args):
+    """Send scheduled campaigns until interrupted"""
+    # The sender (smtplib, MIME, tracing) is only loaded by the command that sends
+    from batch_email.sender import LOG_FORMAT, BatchEmailSender
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, filename='email_log.txt')
+    sender = BatchEmailSender(
+        os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        int(os.environ.get('SMTP_PORT', 587)),
+        os.environ.get('SMTP_EMAIL', ''),
+        os.environ.get('SMTP_PASSWORD', '')
+    )
+    runner = CampaignRunner(queue, sender, rate_limit=args.rate, slice_size=args.slice_size,
+                            poll_interval=args.poll_interval, delay=args.delay, retry_delay=args.retry_delay)
+
+    if args.once:
+        # Send everything that is ready now, then exit (for cron)
+        while runner.run_once():
+            pass
+        sender.disconnect()
+        return
+
+    # Finish the current slice on Ctrl+C or SIGTERM, so progress is recorded
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop())
+    print("Campaign runner started (Ctrl+C to stop)")
+    runner.run_forever()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog='batch-email campaign', description='Schedule campaigns and run the campaign queue')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f'Database file (default: {DEFAULT_DB_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Schedule a campaign')
+    add.add_argument('--csv', required=True, help='CSV file with the recipients')
+    add.add_argument('--html', required=True, help='HTML template file')
+    add.add_argument('--text', help='Plain text template file')
+    add.add_argument('--subject', help='Subject template')
+    add.add_argument('--name', help='Campaign name (default: the CSV path)')
+    add.add_argument('--transactional', action='store_true',
+                     help='High priority: preempts bulk campaigns')
+    add.add_argument('--priority', type=int, help='Explicit priority (higher runs first)')
+    add.add_argument('--start', help='Start time, e.g. 2025-06-01T09:00 (default: now)')
+    add.add_argument('--rate', type=float, help='Recipients per second for this campaign')
+    add.add_argument('--individual', action='store_true', help='One email per recipient instead of BCC batches')
+    add.add_argument('--batch-size', type=int, default=50, help='Recipients per BCC batch (default: 50)')
+    add.add_argument('--no-check-unsubscribed', action='store_true', help='Send to unsubscribed addresses too')
+    add.add_argument('--no-dedupe', action='store_true', help='Keep repeated addresses')
+    add.add_argument('--no-validate', action='store_true', help="Don't drop malformed addresses")
+
+    listing = commands.add_parser('list', help='Show recent campaigns')
+    listing.add_argument('--limit', type=int, default=20, help='Number of campaigns to show (default: 20)')
+
+    cancel = commands.add_parser('cancel', help='Cancel a campaign')
+    cancel.add_argument('campaign_id')
+
+    runner = commands.add_parser('run', help='Send scheduled campaigns')
+    runner.add_argument('--rate', type=float, help='Recipients per second across all campaigns')
+    runner.add_argument('--slice-size', type=int, default=DEFAULT_SLICE_SIZE,
+                        help=f'Rows sent between scheduling decisions (default: {DEFAULT_SLICE_SIZE})')
+    runner.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Seconds between checks when idle (default: {DEFAULT_POLL_INTERVAL})')
+    runner.add_argument('--delay', type=float, default=DEFAULT_DELAY,
+                        help='Seconds between emails or BCC batches when neither --rate nor the campaign '
+                             f'sets a rate (default: {DEFAULT_DELAY})')
+    runner.add_argument('--retry-delay', type=float, default=DEFAULT_RETRY_DELAY,
+                        help='Seconds before retrying a slice in which every send failed '
+                             f'(default: {DEFAULT_RETRY_DELAY})')
+    runner.add_argument('--once', action='store_true', help='Send what is ready now and exit')
+
+    args = parser.parse_args(argv)
+    queue = CampaignQueue(args.db)
+
+    if args.command == 'add':
+        add_campaign(queue, args)
+    elif args.command == 'list':
+        list_campaigns(queue, args.limit)
+    elif args.command == 'cancel':
+        if queue.cancel(args.campaign_id):
+            print(f"Cancelled campaign {args.campaign_id}")
+        else:
+            print(f"Campaign {args.campaign_id} not found or already finished")
+    elif args.command == 'run':
+        run(queue, args)
@@ -0,0 +1,431 @@
+"""
+Scheduled campaigns and the queue runner that sends them.
+
+Campaigns are stored in the subscriber database with a priority, an optional
+start time and an optional rate limit of their own. The runner sends them in
+slices of a few rows over one shared SMTP connection and one shared rate
+budget: after every slice it picks the ready campaign with the highest
+priority, and among campaigns of equal priority the one that waited longest.
+A transactional campaign added while a large bulk campaign is running
+therefore goes out after at most one slice of the bulk one.
+
+Progress is committed after every slice, so a stopped runner resumes each
+campaign where it left off. A crash can repeat at most the slice that was
+being sent. A slice in which every send failed (usually because the SMTP
+server is down) is not recorded: the campaign waits retry_delay seconds and
+the slice is sent again. Run one runner per database.
+"""
+
+import csv
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from batch_email.compression import open_text
+from batch_email.dedup import Deduplicator
+from batch_email.migrations import DEFAULT_DB_PATH, init_db, connect
+from batch_email.recipient_file import RecipientFile, is_recipient_file
+from batch_email.render import RenderCache
+from batch_email.validation import AddressValidator
+
+PRIORITY_BULK = 0
+PRIORITY_TRANSACTIONAL = 100
+
+# Rows sent between scheduling decisions; smaller slices preempt sooner
+DEFAULT_SLICE_SIZE = 100
+
+# Seconds the runner sleeps when no campaign is ready
+DEFAULT_POLL_INTERVAL = 5
+
+# Seconds between SMTP transactions when neither the runner nor the campaign
+# has a rate limit (the same default as send_batch_from_csv's delay)
+DEFAULT_DELAY = 1
+
+# Seconds a campaign waits before retrying a slice in which every send failed
+DEFAULT_RETRY_DELAY = 60
+
+# Send options stored with each campaign (same meaning as in send_batch_from_csv)
+DEFAULT_OPTIONS = {
+    'use_bcc': True,
+    'batch_size': 50,
+    'check_unsubscribed': True,
+    'dedupe': True,
+    'validate': True,
+}
+
+ACTIVE_STATUSES = ('scheduled', 'running')
+
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float], burst: float = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Token bucket limiting how many recipients are sent to per second.
+
+        Args:
+            rate: Recipients per second (None or 0 for no limit)
+            burst: Recipients that may be sent at once after an idle period (defaults to one second's worth)
+            clock: Monotonic clock (replace it in tests)
+            sleep: Sleep function (replace it in tests)
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 0, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        """
+        Take count tokens, sleeping until the budget allows it.
+
+        A request larger than the burst (a big BCC batch) is let through and
+        paid back by waiting afterwards, so the average rate still holds.
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
+
+
+class CampaignQueue:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        """
+        Initialize the campaign queue.
+
+        Args:
+            db_path: Path to the SQLite database that stores the campaigns
+        """
+        self.db_path = db_path
+        init_db(db_path)
+
+    def add(self, csv_path: str, html_template: str, text_template: str = None,
+            subject_template: str = None, name: str = None, priority: int = PRIORITY_BULK,
+            start_at: datetime = None, rate_limit: float = None, **options) -> str:
+        """
+        Schedule a campaign.
+
+        Args:
+            csv_path: CSV file with the recipients
+            html_template: HTML email template with {placeholders}
+            text_template: Plain text template (optional)
+            subject_template: Subject template (optional)
+            name: Name shown in listings (defaults to the CSV file name)
+            priority: Higher runs first (PRIORITY_TRANSACTIONAL preempts PRIORITY_BULK)
+            start_at: Don't start before this time (optional)
+            rate_limit: Recipients per second for this campaign, on top of the shared budget (optional)
+            **options: Send options, see DEFAULT_OPTIONS
+
+        Returns:
+            str: The new campaign id
+        """
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown campaign options: {', '.join(sorted(unknown))}")
+
+        campaign_id = uuid.uuid4().hex
+        conn = connect(self.db_path)
+        conn.execute(
+            'INSERT INTO campaigns (id, name, csv_path, html_template, text_template, subject_template, '
+            'options, priority, rate_limit, start_at, status, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (campaign_id, name or csv_path, csv_path, html_template, text_template, subject_template,
+             json.dumps(dict(DEFAULT_OPTIONS, **options)), priority, rate_limit, start_at,
+             'scheduled', datetime.now())
+        )
+        conn.commit()
+        conn.close()
+
+        logging.info(f"Scheduled campaign {campaign_id} ({name or csv_path}, priority {priority})")
+        return campaign_id
+
+    def get(self, campaign_id: str) -> Optional[Dict]:
+        """Return a campaign, or None if it doesn't exist"""
+        campaigns = self._select('SELECT * FROM campaigns WHERE id = ?', (campaign_id,))
+        return campaigns[0] if campaigns else None
+
+    def list_campaigns(self, limit: int = 50) -> List[Dict]:
+        """Return the most recent campaigns, newest first"""
+        return self._select('SELECT * FROM campaigns ORDER BY created_at DESC LIMIT ?', (limit,))
+
+    def next_ready(self, now: datetime = None) -> Optional[Dict]:
+        """
+        Pick the campaign to send the next slice of.
+
+        Highest priority first; among equal priorities, the one that has waited longest.
+        """
+        campaigns = self._select(
+            'SELECT * FROM campaigns WHERE status IN (?, ?) AND (start_at IS NULL OR start_at <= ?) '
+            "ORDER BY priority DESC, COALESCE(last_run_at, '') ASC, created_at ASC LIMIT 1",
+            ACTIVE_STATUSES + (now or datetime.now(),)
+        )
+        return campaigns[0] if campaigns else None
+
+    def cancel(self, campaign_id: str) -> bool:
+        """
+        Stop a campaign that hasn't finished. The runner drops it at the next slice.
+
+        Returns:
+            bool: False if the campaign doesn't exist or already finished
+        """
+        return self.set_status(campaign_id, 'cancelled', finished_at=datetime.now())
+
+    def record_slice(self, campaign_id: str, rows_done: int, counts: Dict[str, int], finished: bool):
+        """
+        Record the progress of one slice in a single transaction.
+
+        Args:
+            campaign_id: Campaign id
+            rows_done: CSV rows consumed so far (where a restarted runner resumes)
+            counts: sent, failed, skipped, duplicates and invalid counts of this slice
+            finished: True if this was the last slice
+        """
+        now = datetime.now()
+        conn = connect(self.db_path)
+        conn.execute(
+            'UPDATE campaigns SET rows_done = ?, sent = sent + ?, failed = failed + ?, skipped = skipped + ?, '
+            'duplicates = duplicates + ?, invalid = invalid + ?, last_run_at = ?, '
+            'status = CASE WHEN status = ? THEN status ELSE ? END, finished_at = COALESCE(?, finished_at) WHERE id = ?',
+            (rows_done, counts.get('success', 0), counts.get('failed', 0), counts.get('skipped', 0),
+             counts.get('duplicates', 0), counts.get('invalid', 0), now,
+             'cancelled', 'completed' if finished else 'running', now if finished else None, campaign_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def set_status(self, campaign_id: str, status: str, **fields) -> bool:
+        """Change the status of an active campaign"""
+        fields['status'] = status
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        conn = connect(self.db_path)
+        cursor = conn.execute(
+            f'UPDATE campaigns SET {assignments} WHERE id = ? AND status IN (?, ?)',
+            list(fields.values()) + [campaign_id] + list(ACTIVE_STATUSES)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+
+    def _select(self, query: str, params) -> List[Dict]:
+        conn = connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        campaigns = []
+        for row in rows:
+            campaign = dict(row)
+            campaign['options'] = json.loads(campaign['options'] or '{}')
+            campaigns.append(campaign)
+        return campaigns
+
+
+class _CampaignState:
+    def __init__(self, campaign: Dict):
+        """Open file, reader and per-campaign caches of a campaign being sent"""
+        options = campaign['options']
+        self.rows_done = 0
+        self.exhausted = False
+        self.deduplicator = Deduplicator() if options.get('dedupe') else None
+        self.validator = AddressValidator() if options.get('validate') else None
+        self.render_cache = RenderCache(
+            campaign['html_template'], campaign['text_template'],
+            campaign['subject_template'] or "Important Information"
+        )
+        self.limiter = RateLimiter(campaign['rate_limit']) if campaign['rate_limit'] else None
+
+        # Skip the rows a previous run already sent, remembering their addresses
+        # so duplicates later in the file are still dropped
+        self._pending = None
+        if is_recipient_file(campaign['csv_path']):
+            # Compiled files jump straight to the row and only read the email column to skip
+            self.file = RecipientFile(campaign['csv_path'])
+            self.rows_done = min(campaign['rows_done'], len(self.file))
+            if self.deduplicator is not None and 'email' in self.file.columns:
+                for email in self.file.column('email', 0, self.rows_done):
+                    self.deduplicator.is_new(email)
+            self.reader = self.file.rows(self.rows_done)
+            return
+
+        self.file = open_text(campaign['csv_path'])
+        self.reader = csv.DictReader(self.file)
+        for row in self.reader:
+            if self.rows_done >= campaign['rows_done']:
+                self._pending = row
+                break
+            self.rows_done += 1
+            if self.deduplicator is not None:
+                self.deduplicator.is_new(row.get('email') or '')
+        else:
+            self.exhausted = True
+
+    def take(self, count: int) -> List[Dict]:
+        """Read up to count more rows"""
+        rows = []
+        if self._pending is not None:
+            rows.append(self._pending)
+            self._pending = None
+        while len(rows) < count:
+            row = next(self.reader, None)
+            if row is None:
+                self.exhausted = True
+                break
+            rows.append(row)
+        self.rows_done += len(rows)
+        return rows
+
+    def close(self):
+        self.file.close()
+        if self.deduplicator is not None:
+            self.deduplicator.close()
+        if self.validator is not None:
+            self.validator.close()
+
+
+class CampaignRunner:
+    def __init__(self, queue: CampaignQueue, sender, rate_limit: float = None,
+                 slice_size: int = DEFAULT_SLICE_SIZE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 delay: float = DEFAULT_DELAY, retry_delay: float = DEFAULT_RETRY_DELAY):
+        """
+        Initialize the runner.
+
+        Args:
+            queue: Campaign queue to take work from
+            sender: BatchEmailSender shared by all campaigns (one SMTP connection)
+            rate_limit: Recipients per second across all campaigns (None for no limit)
+            slice_size: Rows sent between scheduling decisions
+            poll_interval: Seconds to wait when no campaign is ready
+            delay: Seconds between SMTP transactions of campaigns without a rate limit
+                   when rate_limit isn't set either (0 for no delay)
+            retry_delay: Seconds to wait before retrying a slice in which every send failed
+        """
+        self.queue = queue
+        self.sender = sender
+        self.limiter = RateLimiter(rate_limit)
+        # One transaction per delay seconds: a token bucket holding a single transaction
+        self.pacer = RateLimiter(1 / delay, burst=1) if delay else None
+        self.retry_delay = retry_delay
+        self.slice_size = slice_size
+        self.poll_interval = poll_interval
+        self._states = {}
+        self._stop = threading.Event()
+
+    def run_once(self) -> bool:
+        """
+        Send one slice of the most urgent ready campaign.
+
+        Returns:
+            bool: False if no campaign was ready
+        """
+        campaign = self.queue.next_ready()
+        if campaign is None:
+            self._close_states()
+            return False
+
+        # Campaigns cancelled since the last slice
+        for campaign_id in list(self._states):
+            if campaign_id != campaign['id'] and self.queue.get(campaign_id)['status'] not in ACTIVE_STATUSES:
+                self._states.pop(campaign_id).close()
+
+        try:
+            self._send_slice(campaign)
+        except Exception as e:
+            logging.error(f"Campaign {campaign['id']} failed: {str(e)}")
+            state = self._states.pop(campaign['id'], None)
+            if state is not None:
+                state.close()
+            self.queue.set_status(campaign['id'], 'failed', error=str(e), finished_at=datetime.now())
+        return True
+
+    def _send_slice(self, campaign: Dict):
+        """Send the next slice of a campaign and record its progress"""
+        options = campaign['options']
+        state = self._states.get(campaign['id'])
+        if state is None:
+            state = _CampaignState(campaign)
+            self._states[campaign['id']] = state
+            if campaign['status'] == 'scheduled':
+                self.queue.set_status(campaign['id'], 'running', started_at=datetime.now())
+            logging.info(f"Campaign {campaign['id']} ({campaign['name']}) "
+                         f"{'resumed at row ' + str(state.rows_done) if state.rows_done else 'started'}")
+
+        # Keep BCC batches whole
+        batch_size = options.get('batch_size') or DEFAULT_OPTIONS['batch_size']
+        count = self.slice_size
+        if options.get('use_bcc'):
+            count = max(batch_size, count - count % batch_size)
+
+        rows = state.take(count)
+        counts = {'duplicates': 0, 'invalid': 0}
+        if state.deduplicator is not None:
+            before = state.deduplicator.duplicates
+            rows = list(state.deduplicator.filter_rows(rows))
+            counts['duplicates'] = state.deduplicator.duplicates - before
+        if state.validator is not None:
+            before = state.validator.stats['invalid']
+            rows = list(state.validator.filter_rows(rows))
+            counts['invalid'] = state.validator.stats['invalid'] - before
+
+        def throttle(recipients):
+            if state.limiter is not None:
+                state.limiter.acquire(recipients)
+            self.limiter.acquire(recipients)
+            # Without any rate limit, space transactions out as a single send would
+            if state.limiter is None and not self.limiter.rate and self.pacer is not None:
+                self.pacer.acquire()
+
+        if rows:
+            counts.update(self.sender.send_rows(
+                rows, campaign['html_template'], campaign['text_template'], campaign['subject_template'],
+                delay=0, batch_size=batch_size, use_bcc=options.get('use_bcc'),
+                check_unsubscribed=options.get('check_unsubscribed'),
+                render_cache=state.render_cache, throttle=throttle
+            ))
+
+        if counts.get('failed') and not counts.get('success'):
+            # Nothing got through, usually because the SMTP server is down. Don't record
+            # the slice: drop the state so the next pass resumes from the last recorded
+            # row, and hold the campaign back until retry_delay has passed.
+            self._states.pop(campaign['id']).close()
+            retry_at = datetime.now() + timedelta(seconds=self.retry_delay)
+            self.queue.set_status(campaign['id'], 'running', start_at=retry_at)
+            logging.warning(f"Campaign {campaign['id']} ({campaign['name']}): all {counts['failed']} sends "
+                            f"in the slice failed, retrying from row {campaign['rows_done']} at {retry_at}")
+            return
+
+        self.queue.record_slice(campaign['id'], state.rows_done, counts, state.exhausted)
+        if state.exhausted:
+            self._states.pop(campaign['id']).close()
+            logging.info(f"Campaign {campaign['id']} ({campaign['name']}) completed after {state.rows_done} rows")
+
+    def run_forever(self):
+        """Send campaigns until stop() is called"""
+        logging.info("Campaign runner started")
+        while not self._stop.is_set():
+            if not self.run_once():
+                # Nothing to do: don't hold the SMTP connection open while idle
+                self.sender.disconnect()
+                self._stop.wait(self.poll_interval)
+        self._close_states()
+        self.sender.disconnect()
+        logging.info("Campaign runner stopped")
+
+    def stop(self):
+        """Ask run_forever() to return after the current slice"""
+        self._stop.set()
+
+    def _close_states(self):
+        for state in self._states.values():
+            state.close()
+        self._states.clear()
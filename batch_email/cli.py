@@ -0,0 +1,57 @@
+"""
+The batch-email command.
+
+Each subcommand lives in its own module, which is only imported when that
+subcommand runs: `batch-email sync --filter ...` never loads Flask, smtplib or
+email.mime, and nothing touches the database until a command needs it. Run
+`python -X importtime -m batch_email sync --help` to check what a command imports.
+"""
+
+import importlib
+import sys
+from typing import List
+
+# Subcommand -> (module with a main(argv) function, description for --help)
+COMMANDS = {
+    'send': ('batch_email.sender', 'Send a campaign to a recipient list'),
+    'sync': ('batch_email.sync', 'Sync, filter and compile recipient lists against the subscriber database'),
+    'serve': ('batch_email.web', 'Run the unsubscribe web service'),
+    'campaign': ('batch_email.campaign_runner', 'Schedule campaigns and run the campaign queue'),
+    'create-db': ('batch_email.database', 'Create the subscriber database with sample data'),
+}
+
+
+def usage() -> str:
+    """Top-level help, built without importing any subcommand"""
+    lines = ["usage: batch-email <command> [options]", "", "commands:"]
+    for name, (_, description) in COMMANDS.items():
+        lines.append(f"  {name:<12}{description}")
+    lines += ["", "Run `batch-email <command> --help` for the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None):
+    """
+    Run a subcommand.
+
+    Args:
+        argv: Command line arguments without the program name (default: sys.argv[1:])
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+
+    command = argv[0]
+    if command not in COMMANDS:
+        print(f"batch-email: unknown command '{command}'\n", file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+
+    module = importlib.import_module(COMMANDS[command][0])
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
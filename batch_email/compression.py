@@ -0,0 +1,219 @@
+"""
+Transparent reading of compressed recipient lists.
+
+open_text() opens a CSV whether it is plain, gzip (.gz) or Zstandard (.zst)
+compressed; the format is recognized by the file's first bytes, not its name.
+Compressed files are decompressed while they are read, never to disk. A
+background thread decompresses the next chunks while the caller parses the
+current one (zlib and zstd release the GIL while they work), and reads go
+through large buffers.
+
+Zstandard needs Python 3.14 or the zstandard package (pip install zstandard).
+"""
+
+import gzip
+import io
+import queue
+import threading
+from typing import Optional
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Bytes read (and decompressed) at a time
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Decompressed chunks the background thread may get ahead of the reader
+PREFETCH_CHUNKS = 4
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """
+    Recognize a compressed file by its magic bytes.
+
+    Returns:
+        'gzip', 'zstd', or None for an uncompressed file
+    """
+    with open(path, 'rb') as file:
+        head = file.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def compression_for_name(path: str) -> Optional[str]:
+    """Return the compression implied by a file name (.gz or .zst), or None"""
+    lowered = path.lower()
+    if lowered.endswith('.gz'):
+        return 'gzip'
+    if lowered.endswith('.zst'):
+        return 'zstd'
+    return None
+
+
+def _zstd():
+    """Return a module with zstd stream support (the standard library's, or zstandard's)"""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise RuntimeError(
+            "Reading .zst files requires Python 3.14 or the zstandard package. "
+            "Install it with: pip install zstandard"
+        )
+
+
+class _PrefetchReader(io.RawIOBase):
+    def __init__(self, source, chunk_size: int = READ_BUFFER_SIZE, depth: int = PREFETCH_CHUNKS, file=None):
+        """
+        Raw stream that reads a source in a background thread.
+
+        Args:
+            source: Binary file-like object (e.g. a decompressing reader)
+            chunk_size: Bytes requested from the source at a time
+            depth: Chunks buffered ahead of the reader
+            file: Underlying file to close after the source, if the source doesn't close it
+        """
+        self._source = source
+        self._file = file
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(depth)
+        self._chunk = b''
+        self._position = 0
+        self._eof = False
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._fill, name='prefetch-reader', daemon=True)
+        self._thread.start()
+
+    def _put(self, chunk: bytes) -> bool:
+        """Queue a chunk, giving up if the reader was closed"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fill(self):
+        try:
+            while True:
+                chunk = self._source.read(self._chunk_size)
+                if not self._put(chunk) or not chunk:
+                    return
+        except Exception as e:
+            self._error = e
+            self._put(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._position >= len(self._chunk):
+            if self._eof:
+                return 0
+            self._chunk = self._queue.get()
+            self._position = 0
+            if not self._chunk:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+
+        count = min(len(buffer), len(self._chunk) - self._position)
+        buffer[:count] = self._chunk[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            try:
+                self._source.close()
+            finally:
+                if self._file is not None:
+                    self._file.close()
+        super().close()
+
+
+def open_binary(path: str, compression: str = 'auto'):
+    """
+    Open a file for reading its decompressed bytes.
+
+    Args:
+        path: File to read
+        compression: 'gzip', 'zstd', None, or 'auto' to detect it from the file
+
+    Returns:
+        Binary file-like object
+    """
+    if compression == 'auto':
+        compression = detect_compression(path)
+
+    if compression is None:
+        return open(path, 'rb', buffering=READ_BUFFER_SIZE)
+
+    file = None
+    if compression == 'gzip':
+        # GzipFile doesn't close a file object it was given, so the reader closes it
+        file = open(path, 'rb', buffering=READ_BUFFER_SIZE)
+        source = gzip.GzipFile(fileobj=file)
+    elif compression == 'zstd':
+        zstd = _zstd()
+        if hasattr(zstd, 'ZstdDecompressor') and hasattr(zstd.ZstdDecompressor, 'stream_reader'):
+            # Multi-threaded zstd and concatenated files have several frames; by default
+            # zstandard's reader would stop after the first one
+            source = zstd.ZstdDecompressor().stream_reader(
+                open(path, 'rb', buffering=READ_BUFFER_SIZE), read_size=READ_BUFFER_SIZE,
+                read_across_frames=True, closefd=True
+            )
+        else:
+            source = zstd.open(path, 'rb')
+    else:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    return io.BufferedReader(_PrefetchReader(source, file=file), buffer_size=READ_BUFFER_SIZE)
+
+
+def open_text(path: str, mode: str = 'r', encoding: str = 'utf-8', compression: str = 'auto'):
+    """
+    Open a CSV file, compressed or not, as text (newline='' as the csv module expects).
+
+    Args:
+        path: File to open
+        mode: 'r' to read or 'w' to write
+        encoding: Text encoding
+        compression: 'gzip', 'zstd', None, or 'auto' (detected from the contents when
+                     reading and from the file name when writing)
+
+    Returns:
+        Text file object
+    """
+    if mode == 'r':
+        return io.TextIOWrapper(open_binary(path, compression), encoding=encoding, newline='')
+
+    if mode != 'w':
+        raise ValueError(f"Unsupported mode: {mode}")
+    if compression == 'auto':
+        compression = compression_for_name(path)
+
+    if compression is None:
+        return open(path, 'w', encoding=encoding, newline='', buffering=READ_BUFFER_SIZE)
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding=encoding, newline='')
+    if compression == 'zstd':
+        zstd = _zstd()
+        if hasattr(zstd, 'ZstdCompressor') and hasattr(zstd.ZstdCompressor, 'stream_writer'):
+            writer = zstd.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+            return io.TextIOWrapper(writer, encoding=encoding, newline='')
+        return zstd.open(path, 'wt', encoding=encoding, newline='')
+    raise ValueError(f"Unsupported compression: {compression}")
@@ -0,0 +1,400 @@
+"""
+Creates and initializes the email_subscribers.db database with tables and sample data.
+
+Without options the setup is interactive. With --recreate, --sample,
+--synthetic or --load it runs without prompting and provisions a new database,
+e.g. millions of synthetic subscribers for benchmarks and staging. Bulk loads
+run in a single transaction with the subscribers' secondary indexes dropped
+and rebuilt afterwards, and with durability pragmas turned down: a crash
+during the load leaves a database that should be recreated.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from batch_email.compression import open_text
+from batch_email.emails import normalize_email, email_hash
+from batch_email.migrations import DEFAULT_DB_PATH, analyze, init_db, connect
+
+# Applied to the bulk load connection (a fresh database, nothing to lose on a crash)
+LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = MEMORY',   # rollback still works, nothing written to disk
+    'PRAGMA synchronous = OFF',
+    'PRAGMA temp_store = MEMORY',     # index rebuilds sort in memory
+    'PRAGMA cache_size = -524288',    # 512 MB page cache
+    'PRAGMA locking_mode = EXCLUSIVE',
+]
+
+# Names and domains the synthetic subscribers are made from
+SYNTHETIC_FIRST_NAMES = ['John', 'Jane', 'Michael', 'Emily', 'David', 'Sarah', 'James', 'Olivia',
+                         'William', 'Emma', 'Robert', 'Sophia', 'Joseph', 'Ava', 'Daniel', 'Mia']
+SYNTHETIC_LAST_NAMES = ['Doe', 'Smith', 'Johnson', 'Davis', 'Wilson', 'Brown', 'Taylor', 'Anderson',
+                        'Martinez', 'Thomas', 'Jackson', 'White', 'Harris', 'Clark', 'Lewis']
+SYNTHETIC_DOMAINS = ['example.com', 'example.net', 'example.org']
+
+
+def create_database(db_path: str = DEFAULT_DB_PATH):
+    """Create and initialize the subscriber database"""
+    # Check if database already exists
+    if os.path.exists(db_path):
+        print("Database already exists. Do you want to recreate it? (y/n)")
+        response = input().strip().lower()
+        if response != 'y':
+            print("Operation cancelled.")
+            return False
+        else:
+            os.remove(db_path)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            print("Existing database removed.")
+
+    # Create a new database with the current schema
+    init_db(db_path)
+    conn = connect(db_path)
+    cursor = conn.cursor()
+
+    print("Database and tables created successfully.")
+
+    # Add sample data if requested
+    print("Do you want to add sample data? (y/n)")
+    response = input().strip().lower()
+    if response == 'y':
+        add_sample_data(cursor)
+
+    conn.commit()
+    conn.close()
+
+    return True
+
+
+def add_sample_data(cursor):
+    """Add sample subscribers to the database"""
+    # Sample subscribed users
+    sample_subscribers = [
+        ('john.doe@example.com', 'John', 'Doe', 1),
+        ('jane.smith@example.com', 'Jane', 'Smith', 1),
+        ('michael.johnson@example.com', 'Michael', 'Johnson', 1),
+        ('emily.davis@example.com', 'Emily', 'Davis', 1),
+        ('david.wilson@example.com', 'David', 'Wilson', 1),
+        ('sarah.brown@example.com', 'Sarah', 'Brown', 1),
+        ('james.taylor@example.com', 'James', 'Taylor', 1),
+        ('olivia.anderson@example.com', 'Olivia', 'Anderson', 1),
+        ('william.martinez@example.com', 'William', 'Martinez', 1),
+        ('emma.thomas@example.com', 'Emma', 'Thomas', 1),
+    ]
+
+    # Sample unsubscribed users
+    sample_unsubscribed = [
+        ('robert.jackson@example.com', 'Robert', 'Jackson', 0),
+        ('sophia.white@example.com', 'Sophia', 'White', 0),
+        ('joseph.harris@example.com', 'Joseph', 'Harris', 0),
+    ]
+
+    now = datetime.now()
+
+    # Insert subscribed users
+    for email, first_name, last_name, subscribed in sample_subscribers:
+        email = normalize_email(email)
+        cursor.execute(
+            'INSERT INTO subscribers (email, email_hash, first_name, last_name, subscribed, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (email, email_hash(email), first_name, last_name, subscribed, now, now)
+        )
+
+    # Insert unsubscribed users
+    for email, first_name, last_name, subscribed in sample_unsubscribed:
+        email = normalize_email(email)
+        cursor.execute(
+            'INSERT INTO subscribers (email, email_hash, first_name, last_name, subscribed, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (email, email_hash(email), first_name, last_name, subscribed, now, now)
+        )
+
+    # Add some unsubscribe reasons
+    unsubscribe_reasons = [
+        ('robert.jackson@example.com', 'too-many', 'Emails were too frequent', 'unsubscribe-all', now),
+        ('sophia.white@example.com', 'not-relevant', 'Content wasn\'t relevant to me', 'unsubscribe-all', now),
+        ('joseph.harris@example.com', 'other', 'Moving to a new company', 'unsubscribe-all', now),
+    ]
+
+    for email, reason, comments, preference, timestamp in unsubscribe_reasons:
+        cursor.execute(
+            'INSERT INTO unsubscribe_reasons (email, reason, comments, preference, unsubscribed_at) VALUES (?, ?, ?, ?, ?)',
+            (email, reason, comments, preference, timestamp)
+        )
+
+    print(f"Added {len(sample_subscribers)} subscribed and {len(sample_unsubscribed)} unsubscribed sample users.")
+
+
+def csv_subscribers(csv_path: str) -> Iterator[Tuple]:
+    """
+    Read subscribers from a CSV (plain or compressed) with an email column.
+
+    first_name, last_name and subscribed ('0' for unsubscribed, as written by
+    `sync --update`) are used when present.
+
+    Yields:
+        (email, email hash, first name, last name, subscribed)
+    """
+    with open_text(csv_path) as file:
+        for row in csv.DictReader(file):
+            email = normalize_email(row.get('email'))
+            if email:
+                yield (email, email_hash(email), row.get('first_name') or '', row.get('last_name') or '',
+                       0 if (row.get('subscribed') or '').strip() == '0' else 1)
+
+
+def _bulk_insert(db_path: str, insert: Callable) -> int:
+    """
+    Run a bulk insert into subscribers in one transaction with load pragmas.
+
+    The secondary indexes on subscribers are dropped for the load and rebuilt
+    from their stored definitions afterwards (sorting once is much faster than
+    updating them row by row).
+
+    Args:
+        db_path: Path to the SQLite database, with the schema already created
+        insert: Function called with the connection and the timestamp for the
+                new rows; returns the number of rows inserted
+
+    Returns:
+        int: Number of subscribers inserted
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(pragma)
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'subscribers' AND sql IS NOT NULL"
+        ).fetchall()
+
+        conn.execute('BEGIN')
+        try:
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX {name}')
+            count = insert(conn, str(datetime.now()))
+            for _, sql in indexes:
+                conn.execute(sql)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        # Back to the normal modes, so the other scripts can open the database concurrently
+        conn.execute('PRAGMA locking_mode = NORMAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.close()
+    return count
+
+
+def bulk_load(rows: Iterable[Tuple], db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    Insert many subscribers into a newly created database with one executemany.
+
+    Addresses that are already present are skipped.
+
+    Args:
+        rows: (email, email hash, first name, last name, subscribed) tuples
+        db_path: Path to the SQLite database, with the schema already created
+
+    Returns:
+        int: Number of subscribers inserted
+    """
+    def insert(conn, now):
+        return conn.executemany(
+            'INSERT OR IGNORE INTO subscribers (email, email_hash, first_name, last_name, subscribed, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (row + (now, now) for row in rows)
+        ).rowcount
+
+    return _bulk_insert(db_path, insert)
+
+
+def generate_subscribers(count: int, unsubscribed_fraction: float = 0.05, db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    Insert synthetic subscribers into a newly created database.
+
+    The rows are generated inside SQLite by one INSERT ... SELECT over a
+    recursive sequence, with email_hash() registered as a SQL function. The
+    hash is the largest single cost (blake2b runs in Python for every row),
+    but computing it in bulk and passing tuples to executemany, or backfilling
+    it after the load, measured no faster. Addresses are generated in sorted
+    order (subscriber0000000000@example.com, ...), so the email index is only
+    ever appended to. Unsubscribed rows are spread evenly.
+
+    Args:
+        count: Number of subscribers
+        unsubscribed_fraction: Fraction of them marked unsubscribed
+        db_path: Path to the SQLite database, with the schema already created
+
+    Returns:
+        int: Number of subscribers inserted
+    """
+    if not 0 <= unsubscribed_fraction <= 1:
+        raise ValueError("unsubscribed_fraction must be between 0 and 1")
+
+    # One row per combination of name and domain; row n uses combination n % len(pattern)
+    pattern = [(first_name, last_name) for last_name in SYNTHETIC_LAST_NAMES for first_name in SYNTHETIC_FIRST_NAMES]
+    pattern = [(number, first_name, last_name, SYNTHETIC_DOMAINS[number % len(SYNTHETIC_DOMAINS)])
+               for number, (first_name, last_name) in enumerate(pattern * len(SYNTHETIC_DOMAINS))]
+
+    def insert(conn, now):
+        conn.create_function('email_hash', 1, email_hash, deterministic=True)
+        conn.execute('CREATE TEMP TABLE synthetic_pattern (k INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, domain TEXT)')
+        conn.executemany('INSERT INTO synthetic_pattern VALUES (?, ?, ?, ?)', pattern)
+        # Row n is unsubscribed when the running count of unsubscribed rows steps up
+        return conn.execute(
+            """
+            INSERT OR IGNORE INTO subscribers (email, email_hash, first_name, last_name, subscribed, created_at, updated_at)
+            SELECT email, email_hash(email), first_name, last_name,
+                   CAST((n + 1) * :fraction AS INTEGER) = CAST(n * :fraction AS INTEGER), :now, :now
+            FROM (
+                WITH RECURSIVE sequence (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM sequence WHERE n + 1 < :count)
+                SELECT n, printf('subscriber%010d@%s', n, domain) AS email, first_name, last_name
+                FROM sequence JOIN synthetic_pattern ON k = n % :period
+            )
+            """,
+            {'count': count, 'fraction': unsubscribed_fraction, 'now': now, 'period': len(pattern)}
+        ).rowcount
+
+    if count <= 0:
+        return 0
+    return _bulk_insert(db_path, insert)
+
+
+def provision(db_path: str = DEFAULT_DB_PATH, recreate: bool = False, sample: bool = False,
+              synthetic: int = 0, load_csv: str = None, unsubscribed_fraction: float = 0.05) -> bool:
+    """
+    Create a database without prompting, optionally filled with subscribers.
+
+    Args:
+        db_path: Path to the SQLite database
+        recreate: Delete the database first if it exists
+        sample: Add the sample subscribers
+        synthetic: Number of synthetic subscribers to generate
+        load_csv: CSV file to load subscribers from
+        unsubscribed_fraction: Fraction of the synthetic subscribers marked unsubscribed
+
+    Returns:
+        bool: False if the database already exists and recreate wasn't given
+    """
+    if os.path.exists(db_path):
+        if not recreate:
+            print(f"Database {db_path} already exists. Pass --recreate to replace it.")
+            return False
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        print("Existing database removed.")
+
+    init_db(db_path)
+    print(f"Database {db_path} created.")
+
+    if sample:
+        conn = connect(db_path)
+        add_sample_data(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    if synthetic:
+        started = time.perf_counter()
+        count = generate_subscribers(synthetic, unsubscribed_fraction, db_path)
+        print(f"Generated {count} synthetic subscribers in {time.perf_counter() - started:.1f}s")
+
+    if load_csv:
+        started = time.perf_counter()
+        count = bulk_load(csv_subscribers(load_csv), db_path)
+        print(f"Loaded {count} subscribers from {load_csv} in {time.perf_counter() - started:.1f}s")
+
+    if synthetic or load_csv:
+        # Fresh statistics, so the planner uses the rebuilt indexes
+        analyze(db_path)
+    return True
+
+
+def check_database(db_path: str = DEFAULT_DB_PATH):
+    """Check if the database exists and has the expected tables"""
+    if not os.path.exists(db_path):
+        print("Database does not exist yet.")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Check for subscribers table
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='subscribers'")
+        if not cursor.fetchone():
+            print("Subscribers table does not exist.")
+            conn.close()
+            return False
+
+        # Check for unsubscribe_reasons table
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='unsubscribe_reasons'")
+        if not cursor.fetchone():
+            print("Unsubscribe_reasons table does not exist.")
+            conn.close()
+            return False
+
+        # Count records
+        cursor.execute("SELECT COUNT(*) FROM subscribers")
+        subscriber_count = cursor.fetchone()[0]
+
+        cursor.execute("SELECT COUNT(*) FROM unsubscribe_reasons")
+        reason_count = cursor.fetchone()[0]
+
+        print(f"Database exists with {subscriber_count} subscribers and {reason_count} unsubscribe reasons.")
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"Error checking database: {str(e)}")
+        return False
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog='batch-email create-db',
+                                     description='Create the subscriber database, optionally with sample data')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f'Database file (default: {DEFAULT_DB_PATH})')
+    parser.add_argument('--recreate', action='store_true', help='Replace an existing database without asking')
+    parser.add_argument('--sample', action='store_true', help='Add the sample subscribers')
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N', help='Generate N synthetic subscribers (roughly 1-1.5 million per 10 seconds)')
+    parser.add_argument('--unsubscribed-fraction', type=float, default=0.05,
+                        help='Fraction of synthetic subscribers marked unsubscribed (default: 0.05)')
+    parser.add_argument('--load', metavar='CSV', help='Load subscribers from a CSV (email, first_name, last_name, subscribed)')
+    args = parser.parse_args(argv)
+
+    if args.recreate or args.sample or args.synthetic or args.load:
+        # Provisioning mode: no prompts
+        if args.load and not os.path.exists(args.load):
+            parser.error(f"File {args.load} not found")
+        if not 0 <= args.unsubscribed_fraction <= 1:
+            parser.error("--unsubscribed-fraction must be between 0 and 1")
+        if not provision(args.db, args.recreate, args.sample, args.synthetic, args.load, args.unsubscribed_fraction):
+            return 1
+        return 0
+
+    print("Email Subscriber Database Setup")
+    print("===============================")
+
+    if check_database(args.db):
+        print("\nThe database already exists. What would you like to do?")
+        print("1. Use existing database")
+        print("2. Recreate database (this will delete all existing data)")
+        print("3. Exit")
+
+        choice = input("Enter your choice (1-3): ").strip()
+
+        if choice == '1':
+            print("Using existing database.")
+        elif choice == '2':
+            create_database(args.db)
+        else:
+            print("Exiting without changes.")
+    else:
+        print("\nNo database found. Creating new database...")
+        create_database(args.db)
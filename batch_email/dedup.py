@@ -0,0 +1,191 @@
+"""
+Streaming deduplication of recipient addresses.
+
+Addresses are compared by a dedup key: the normalized address (trimmed and
+lowercased) with optional per-domain rules applied, such as Gmail ignoring
+dots and "+tag" suffixes in the local part. Keys are kept as 64-bit hashes in
+memory; once more than max_memory_keys have been seen, they spill to a
+temporary SQLite file so very large lists don't exhaust memory. The same
+applies to the exact addresses remembered on rule domains (to tell exact
+duplicates from rule-based ones), which share the spill table.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+from typing import Dict, Iterable, Iterator
+
+from batch_email.emails import normalize_email
+
+# Rules per domain: 'plus' drops a "+tag" suffix, 'dots' removes dots from the
+# local part. 'alias' maps the domain onto another one.
+DEFAULT_DOMAIN_RULES = {
+    'gmail.com': {'plus': True, 'dots': True},
+    'googlemail.com': {'plus': True, 'dots': True, 'alias': 'gmail.com'},
+}
+
+# Rules for imports: only case and whitespace are ignored, so every variant address
+# (e.g. j.doe+x@gmail.com) gets its own subscriber row that lookups and unsubscribes
+# can match exactly. The per-domain rules only apply when choosing whom to send to.
+EXACT_RULES: Dict[str, Dict] = {}
+
+DEFAULT_MAX_MEMORY_KEYS = 2_000_000
+
+# Namespaces in the spill table: dedup keys, and exact addresses on rule domains
+KIND_KEY = 0
+KIND_EXACT = 1
+
+
+def dedup_key(email: str, domain_rules: Dict[str, Dict] = None) -> str:
+    """
+    Return the key used to decide whether two addresses are the same mailbox.
+
+    Args:
+        email: Email address (normalized or not)
+        domain_rules: Per-domain rules (defaults to DEFAULT_DOMAIN_RULES)
+
+    Returns:
+        str: The dedup key, or '' for a blank address
+    """
+    email = normalize_email(email)
+    if domain_rules is None:
+        domain_rules = DEFAULT_DOMAIN_RULES
+
+    local, at, domain = email.rpartition('@')
+    if not at:
+        return email
+
+    rules = domain_rules.get(domain)
+    if not rules:
+        return email
+
+    if rules.get('plus'):
+        local = local.split('+', 1)[0]
+    if rules.get('dots'):
+        local = local.replace('.', '')
+    return f"{local}@{rules.get('alias', domain)}"
+
+
+class Deduplicator:
+    def __init__(self, domain_rules: Dict[str, Dict] = None,
+                 max_memory_keys: int = DEFAULT_MAX_MEMORY_KEYS, spill_dir: str = None):
+        """
+        Track which addresses have been seen in a stream.
+
+        Args:
+            domain_rules: Per-domain normalization rules (defaults to DEFAULT_DOMAIN_RULES,
+                          pass {} to only ignore case and whitespace)
+            max_memory_keys: Keys (dedup keys and exact addresses) held in memory before spilling to disk
+            spill_dir: Directory for the spill file (defaults to the system temp dir)
+        """
+        self.domain_rules = DEFAULT_DOMAIN_RULES if domain_rules is None else domain_rules
+        self.max_memory_keys = max_memory_keys
+        self.spill_dir = spill_dir
+        # Hashes of the dedup keys, and of the exact addresses seen on domains
+        # that have rules (used to tell exact duplicates from rule-based ones)
+        self._memory = {KIND_KEY: set(), KIND_EXACT: set()}
+        self._memory_keys = 0
+        self._spill = None
+        self._spill_path = None
+        self.stats = {'total': 0, 'unique': 0, 'exact_duplicates': 0, 'rule_duplicates': 0}
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """64-bit hash of a key; collisions are negligible at mailing-list sizes"""
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+    def _add(self, kind: int, value: int) -> bool:
+        """Record a hash of the given kind, spilling to disk if needed. Returns True if it was new."""
+        seen = self._memory[kind]
+        if value in seen:
+            return False
+
+        if self._spill is not None:
+            cursor = self._spill.execute('SELECT 1 FROM seen WHERE kind = ? AND key = ?', (kind, value))
+            if cursor.fetchone() is not None:
+                return False
+
+        seen.add(value)
+        self._memory_keys += 1
+        if self._memory_keys >= self.max_memory_keys:
+            self._spill_to_disk()
+        return True
+
+    def _spill_to_disk(self):
+        """Move the in-memory hashes into a temporary on-disk table"""
+        if self._spill is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix='dedup-', suffix='.db', dir=self.spill_dir)
+            os.close(fd)
+            self._spill = sqlite3.connect(self._spill_path, isolation_level=None)
+            self._spill.execute('PRAGMA journal_mode = OFF')
+            self._spill.execute('PRAGMA synchronous = OFF')
+            self._spill.execute('CREATE TABLE seen (kind INTEGER, key INTEGER, PRIMARY KEY (kind, key)) WITHOUT ROWID')
+        self._spill.execute('BEGIN')
+        for kind, seen in self._memory.items():
+            self._spill.executemany('INSERT OR IGNORE INTO seen (kind, key) VALUES (?, ?)',
+                                    ((kind, key) for key in seen))
+            seen.clear()
+        self._spill.execute('COMMIT')
+        self._memory_keys = 0
+
+    def is_new(self, email: str) -> bool:
+        """
+        Record an address and report whether it is the first time it was seen.
+
+        Blank addresses are always reported as new (they are left for the caller to handle).
+        """
+        self.stats['total'] += 1
+        normalized = normalize_email(email)
+        if not normalized:
+            return True
+
+        key = dedup_key(normalized, self.domain_rules)
+        has_rules = normalized.rpartition('@')[2] in self.domain_rules
+        exact_hash = self._hash(normalized) if has_rules else None
+
+        if self._add(KIND_KEY, self._hash(key)):
+            self.stats['unique'] += 1
+            if has_rules:
+                self._add(KIND_EXACT, exact_hash)
+            return True
+
+        # Duplicate: was it the same address, or only the same after domain rules?
+        if not has_rules or not self._add(KIND_EXACT, exact_hash):
+            self.stats['exact_duplicates'] += 1
+        else:
+            self.stats['rule_duplicates'] += 1
+        return False
+
+    def filter_rows(self, rows: Iterable[Dict], field: str = 'email') -> Iterator[Dict]:
+        """Yield only the rows whose address hasn't been seen before"""
+        for row in rows:
+            if self.is_new(row.get(field) or ''):
+                yield row
+
+    def filter_emails(self, emails: Iterable[str]) -> Iterator[str]:
+        """Yield only the addresses that haven't been seen before"""
+        for email in emails:
+            if self.is_new(email):
+                yield email
+
+    @property
+    def duplicates(self) -> int:
+        """Total number of duplicates removed so far"""
+        return self.stats['exact_duplicates'] + self.stats['rule_duplicates']
+
+    def close(self):
+        """Delete the spill file, if one was created"""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            os.remove(self._spill_path)
+        for seen in self._memory.values():
+            seen.clear()
+        self._memory_keys = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,135 @@
+"""
+Email address normalization and hashed subscriber lookups.
+
+Subscribers are stored under their normalized (trimmed, lowercase) address
+together with a 64-bit hash of it. Point lookups go through the covering index
+on (email_hash, subscribed), which is much smaller than an index on the full
+address text.
+"""
+
+import hashlib
+from typing import Dict, Iterable
+
+# SQLite's default limit on bound parameters is 999 on older builds
+LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_email(email: str) -> str:
+    """Return the canonical form of an email address (trimmed and lowercased)"""
+    return email.strip().lower() if email else ''
+
+
+def email_hash(email: str) -> int:
+    """
+    Return a signed 64-bit hash of an already normalized email address.
+
+    The value fits SQLite's INTEGER type, so it can be indexed compactly.
+    """
+    digest = hashlib.blake2b(email.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def fetch_subscription_status(cursor, emails: Iterable[str]) -> Dict[str, bool]:
+    """
+    Look up the subscription status of many addresses at once.
+
+    Args:
+        cursor: SQLite cursor on the subscriber database
+        emails: Email addresses (normalized or not)
+
+    Returns:
+        Dict mapping each normalized address found in the database to its
+        subscription status. Addresses that aren't in the database are omitted.
+        If two addresses share a hash, the more conservative status (unsubscribed) wins.
+    """
+    by_hash = {}
+    for email in emails:
+        normalized = normalize_email(email)
+        if normalized:
+            by_hash.setdefault(email_hash(normalized), []).append(normalized)
+
+    status = {}
+    hashes = list(by_hash)
+    for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+        chunk = hashes[i:i + LOOKUP_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(
+            f'SELECT email_hash, subscribed FROM subscribers WHERE email_hash IN ({placeholders})',
+            chunk
+        )
+        for hash_value, subscribed in cursor.fetchall():
+            for normalized in by_hash[hash_value]:
+                status[normalized] = status.get(normalized, True) and bool(subscribed)
+
+    return status
+
+
+def has_email_hash_column(cursor) -> bool:
+    """Check whether the subscribers table already has the email_hash column"""
+    cursor.execute('PRAGMA table_info(subscribers)')
+    return any(column[1] == 'email_hash' for column in cursor.fetchall())
+
+
+def migrate_email_index(conn) -> bool:
+    """
+    Upgrade a subscribers table to normalized addresses with a hash index.
+
+    Lowercases and trims stored addresses (merging rows that only differed by
+    case, keeping the unsubscribed status if either was unsubscribed), fills in
+    email_hash, creates the covering (email_hash, subscribed) index and drops
+    the redundant index on the email column. Safe to run repeatedly. The
+    caller is responsible for committing.
+
+    Args:
+        conn: SQLite connection to the subscriber database
+
+    Returns:
+        bool: True if anything was changed
+    """
+    cursor = conn.cursor()
+    changed = False
+
+    if not has_email_hash_column(cursor):
+        cursor.execute('ALTER TABLE subscribers ADD COLUMN email_hash INTEGER')
+        changed = True
+
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_subscribers_email_hash ON subscribers(email_hash, subscribed)'
+    )
+    cursor.execute('DROP INDEX IF EXISTS idx_subscribers_email')
+
+    cursor.execute('SELECT 1 FROM subscribers WHERE email_hash IS NULL AND email IS NOT NULL LIMIT 1')
+    if cursor.fetchone() is None:
+        return changed
+
+    # Normalize addresses that aren't stored in canonical form yet
+    cursor.execute('SELECT id, email, subscribed FROM subscribers WHERE email_hash IS NULL AND email IS NOT NULL')
+    for row_id, email, subscribed in cursor.fetchall():
+        normalized = normalize_email(email)
+        if normalized == email:
+            continue
+
+        cursor.execute('SELECT id, subscribed FROM subscribers WHERE email = ?', (normalized,))
+        existing = cursor.fetchone()
+        if existing is None:
+            cursor.execute('UPDATE subscribers SET email = ? WHERE id = ?', (normalized, row_id))
+        else:
+            # Same address stored twice with different case: keep one row
+            if not subscribed and existing[1]:
+                cursor.execute('UPDATE subscribers SET subscribed = 0 WHERE id = ?', (existing[0],))
+            cursor.execute('DELETE FROM subscribers WHERE id = ?', (row_id,))
+
+    if _table_exists(cursor, 'unsubscribe_reasons'):
+        cursor.execute(
+            "UPDATE unsubscribe_reasons SET email = lower(trim(email)) WHERE email != lower(trim(email))"
+        )
+
+    conn.create_function('email_hash', 1, email_hash, deterministic=True)
+    cursor.execute('UPDATE subscribers SET email_hash = email_hash(email) WHERE email_hash IS NULL AND email IS NOT NULL')
+    return True
+
+
+def _table_exists(cursor, name: str) -> bool:
+    """Check whether a table exists in the database"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
@@ -0,0 +1,301 @@
+"""
+Background subscriber import jobs.
+
+Uploaded CSV files are spooled to disk and imported by a worker thread so the
+HTTP request returns immediately. Job progress is stored in the subscriber
+database, which lets any web worker process answer status requests.
+"""
+
+import csv
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from batch_email.compression import compression_for_name, open_binary, open_text
+from batch_email.dedup import EXACT_RULES, Deduplicator
+from batch_email.migrations import init_db, connect
+from batch_email.store import SubscriberStore, open_store
+
+# Number of rows written per transaction while importing
+IMPORT_CHUNK_SIZE = 5000
+
+
+def count_rows(path: str) -> int:
+    """
+    Count the data rows in a CSV file by scanning for newlines.
+
+    This is an estimate (quoted fields may contain newlines) used only for
+    progress reporting. Compressed files are decompressed to count them.
+    """
+    lines = 0
+    last = b''
+    with open_binary(path) as file:
+        while True:
+            chunk = file.read(1024 * 1024)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last and last != b'\n':
+        lines += 1
+    # Don't count the header row
+    return max(lines - 1, 0)
+
+
+def requeue_interrupted(db_path: str = 'email_subscribers.db') -> int:
+    """
+    Mark jobs left running by a stopped server as queued again.
+
+    Call this once from the process that launches the web workers, before
+    any worker starts importing. It only touches the job table, so it doesn't
+    open the subscriber store (nothing is shared with forked workers).
+
+    Returns:
+        int: Number of jobs reset
+    """
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE import_jobs SET status = 'queued' WHERE status = 'running'")
+    count = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+
+class ImportJobManager:
+    def __init__(self, db_path: str = 'email_subscribers.db', spool_dir: str = 'import_spool',
+                 store: SubscriberStore = None):
+        """
+        Initialize the import job manager.
+
+        Args:
+            db_path: Path to the SQLite database that tracks import jobs
+            spool_dir: Directory where uploaded files are stored until imported
+            store: Subscriber store to import into (defaults to open_store())
+        """
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.store = store or open_store()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        init_db(self.db_path)
+
+    def submit(self, upload, filename: str) -> str:
+        """
+        Spool an uploaded file to disk and queue it for import.
+
+        Args:
+            upload: File-like object or werkzeug FileStorage with the CSV data
+            filename: Original name of the uploaded file
+
+        Returns:
+            str: The new job id
+        """
+        job_id = uuid.uuid4().hex
+        # Compressed uploads are spooled as they are and decompressed while importing
+        extension = {'gzip': '.csv.gz', 'zstd': '.csv.zst'}.get(compression_for_name(filename or ''), '.csv')
+        spool_path = os.path.join(self.spool_dir, f"{job_id}{extension}")
+
+        if hasattr(upload, 'save'):
+            upload.save(spool_path)
+        else:
+            with open(spool_path, 'wb') as spool:
+                while True:
+                    chunk = upload.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    spool.write(chunk)
+
+        conn = connect(self.db_path)
+        conn.execute(
+            'INSERT INTO import_jobs (id, filename, spool_path, status, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, filename, spool_path, 'queued', datetime.now())
+        )
+        conn.commit()
+        conn.close()
+
+        logging.info(f"Queued import job {job_id} for {filename}")
+        self._queue.put(job_id)
+        self._ensure_worker()
+        return job_id
+
+    def requeue_interrupted(self) -> int:
+        """Mark jobs left running by a stopped server as queued again (see requeue_interrupted())"""
+        return requeue_interrupted(self.db_path)
+
+    def resume_pending(self) -> int:
+        """
+        Queue jobs that were submitted but not yet started.
+
+        Several web workers may call this; each job is claimed by exactly one.
+
+        Returns:
+            int: Number of jobs queued
+        """
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id FROM import_jobs WHERE status = 'queued' ORDER BY created_at"
+        )
+        job_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        for job_id in job_ids:
+            self._queue.put(job_id)
+        if job_ids:
+            self._ensure_worker()
+        return len(job_ids)
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """
+        Get the status of an import job, including throughput and ETA.
+
+        Args:
+            job_id: Id returned by submit()
+
+        Returns:
+            Dict with job details, or None if the job doesn't exist
+        """
+        conn = connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM import_jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if row is None:
+            return None
+        return self._describe(row)
+
+    def list_jobs(self, limit: int = 50) -> List[Dict]:
+        """Return the most recent import jobs, newest first"""
+        conn = connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM import_jobs ORDER BY created_at DESC LIMIT ?', (limit,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [self._describe(row) for row in rows]
+
+    def _describe(self, row) -> Dict:
+        """Convert an import_jobs row into a status dictionary"""
+        status = {
+            'job_id': row['id'],
+            'filename': row['filename'],
+            'status': row['status'],
+            'rows_total': row['rows_total'],
+            'rows_processed': row['rows_processed'],
+            'rows_imported': row['rows_imported'],
+            'rows_duplicate': row['rows_duplicate'],
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'rows_per_sec': None,
+            'eta_seconds': None,
+        }
+
+        if row['started_at']:
+            started = datetime.fromisoformat(str(row['started_at']))
+            finished = datetime.fromisoformat(str(row['finished_at'])) if row['finished_at'] else datetime.now()
+            elapsed = (finished - started).total_seconds()
+            if elapsed > 0 and row['rows_processed']:
+                rate = row['rows_processed'] / elapsed
+                status['rows_per_sec'] = round(rate, 1)
+                if row['status'] == 'running':
+                    remaining = max(row['rows_total'] - row['rows_processed'], 0)
+                    status['eta_seconds'] = round(remaining / rate, 1)
+
+        return status
+
+    def _ensure_worker(self):
+        """Start the worker thread if it isn't running"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='import-worker', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Worker loop: import queued jobs one at a time"""
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._import(job_id)
+            except Exception as e:
+                logging.error(f"Import job {job_id} failed: {str(e)}")
+                self._update(job_id, status='failed', error=str(e), finished_at=datetime.now())
+            finally:
+                self._queue.task_done()
+
+    def _update(self, job_id: str, **fields):
+        """Update columns of an import job"""
+        conn = connect(self.db_path)
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        conn.execute(
+            f'UPDATE import_jobs SET {assignments} WHERE id = ?',
+            list(fields.values()) + [job_id]
+        )
+        conn.commit()
+        conn.close()
+
+    def _import(self, job_id: str):
+        """Import a spooled CSV file in chunks, recording progress after each chunk"""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Claim the job so no other worker process imports it too
+        cursor.execute(
+            "UPDATE import_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (datetime.now(), job_id)
+        )
+        conn.commit()
+        if cursor.rowcount == 0:
+            conn.close()
+            return
+
+        cursor.execute('SELECT spool_path FROM import_jobs WHERE id = ?', (job_id,))
+        spool_path = cursor.fetchone()[0]
+        rows_total = count_rows(spool_path)
+        self._update(job_id, rows_total=rows_total, rows_processed=0, rows_imported=0)
+        logging.info(f"Import job {job_id} started ({rows_total} rows)")
+
+        processed = 0
+        imported = 0
+        chunk = []
+
+        def flush():
+            nonlocal imported
+            imported += self.store.upsert_subscribers(chunk)
+            cursor.execute(
+                'UPDATE import_jobs SET rows_processed = ?, rows_imported = ?, rows_duplicate = ? WHERE id = ?',
+                (processed, imported, deduplicator.duplicates, job_id)
+            )
+            conn.commit()
+            chunk.clear()
+
+        with open_text(spool_path) as file, Deduplicator(EXACT_RULES) as deduplicator:
+            reader = csv.DictReader(file)
+            for row in reader:
+                processed += 1
+                if not deduplicator.is_new(row.get('email') or ''):
+                    continue
+                chunk.append((row.get('email') or '', row.get('first_name') or '', row.get('last_name') or ''))
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    flush()
+
+            flush()
+        conn.close()
+
+        self._update(job_id, status='completed', rows_total=processed, rows_processed=processed,
+                     rows_imported=imported, rows_duplicate=deduplicator.duplicates, finished_at=datetime.now())
+        os.remove(spool_path)
+        logging.info(f"Import job {job_id} completed: {imported} new subscribers from {processed} rows "
+                     f"({deduplicator.duplicates} duplicates skipped)")
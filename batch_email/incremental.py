@@ -0,0 +1,254 @@
+"""
+Change tracking for incremental CSV syncs.
+
+A full sync imports every row of a recipient CSV and rewrites the file with
+each row's subscription status. An incremental sync only touches what changed
+since the previous run:
+
+- Rows appended to the file are found by byte offset. The file is trusted to
+  have only grown if it didn't shrink and a fingerprint of its first bytes and
+  of the bytes just before the previous end still matches.
+- Subscribers whose status changed are found through a high-water mark on
+  subscribers.updated_at. Subscribers that were only added since (such as the
+  rows the previous sync imported) are skipped, since their rows were written
+  with the status they still have. The rows of the others are located through
+  the row positions recorded at the previous sync, and the 'subscribed' value
+  is rewritten in place ('0' and '1' have the same length).
+
+Appended rows are rewritten (with their status added) in a copy of the file,
+which replaces the original only once it is complete and flushed to disk, so
+an interrupted sync never loses rows.
+
+The state is kept in the local SQLite database (sync_files and sync_rows).
+Anything that doesn't match what was recorded makes the caller fall back to a
+full sync, which records the state afresh.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batch_email.emails import LOOKUP_CHUNK_SIZE, email_hash, normalize_email
+from batch_email.migrations import DEFAULT_DB_PATH, init_db, connect
+
+# Bytes hashed at the start of the file and before the previous end
+FINGERPRINT_WINDOW = 64 * 1024
+
+# Changes are re-read from this long before the high-water mark, so updates
+# stamped by a slightly slow clock or committed late are not missed
+CLOCK_SKEW_MARGIN = timedelta(minutes=5)
+
+# Row positions written per statement
+POSITION_CHUNK_SIZE = 5000
+
+
+def fingerprint(path: str, size: int) -> str:
+    """
+    Hash the first bytes of a file and the bytes just before offset size.
+
+    Returns:
+        Hex digest that changes if either window (or size) changes
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as file:
+        digest.update(file.read(min(FINGERPRINT_WINDOW, size)))
+        tail = max(size - FINGERPRINT_WINDOW, FINGERPRINT_WINDOW)
+        if tail < size:
+            file.seek(tail)
+            digest.update(file.read(size - tail))
+    return digest.hexdigest()
+
+
+def read_records(file, position: int = 0) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Read CSV records from a binary file together with their byte positions.
+
+    Args:
+        file: File opened in binary mode
+        position: Byte offset of the first record to read
+
+    Yields:
+        (byte position of the record, list of fields); blank lines are skipped
+    """
+    file.seek(position)
+    consumed = position
+
+    def lines():
+        nonlocal consumed
+        for line in file:
+            consumed += len(line)
+            yield line.decode('utf-8')
+
+    start = position
+    # csv.reader pulls exactly the lines of one record, so consumed is where the next one starts
+    for fields in csv.reader(lines()):
+        if fields:
+            yield start, fields
+        start = consumed
+
+
+def format_record(fields: List[str]) -> bytes:
+    """Encode one record the way csv.DictWriter writes it"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue().encode('utf-8')
+
+
+def rewrite_record(file, position: int, old_fields: List[str], new_fields: List[str]) -> bool:
+    """
+    Overwrite the record at position in place.
+
+    The record is only written if it is stored exactly as format_record()
+    would write old_fields and the new record has the same length.
+
+    Returns:
+        bool: False if the record couldn't be rewritten in place
+    """
+    old = format_record(old_fields)
+    new = format_record(new_fields)
+    if len(old) != len(new):
+        return False
+    file.seek(position)
+    if file.read(len(old)) != old:
+        return False
+    file.seek(position)
+    file.write(new)
+    return True
+
+
+def copy_prefix(path: str, size: int) -> str:
+    """
+    Copy the first size bytes of a file to a new temporary file next to it.
+
+    The copy is in the same directory (so os.replace() can move it over the
+    original) and has the original's permissions.
+
+    Returns:
+        str: Path of the copy
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as copy, open(path, 'rb') as original:
+            remaining = size
+            while remaining:
+                chunk = original.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                copy.write(chunk)
+                remaining -= len(chunk)
+        shutil.copymode(path, temp_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def row_positions(records: Iterable[Tuple[int, List[str]]], email_index: int) -> Iterator[Tuple[int, int]]:
+    """Yield (email hash, byte position) for records with an address in column email_index"""
+    for position, fields in records:
+        email = normalize_email(fields[email_index]) if email_index < len(fields) else ''
+        if email:
+            yield email_hash(email), position
+
+
+class SyncState:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        """
+        Initialize the sync state.
+
+        Args:
+            db_path: Path to the SQLite database that stores the state
+        """
+        self.db_path = db_path
+        init_db(db_path)
+
+    def get(self, path: str) -> Optional[Dict]:
+        """Return what was recorded at the last sync of a file, or None"""
+        conn = connect(self.db_path)
+        row = conn.execute(
+            'SELECT id, size, fingerprint, columns, high_water FROM sync_files WHERE path = ?',
+            (os.path.abspath(path),)
+        ).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return {
+            'id': row[0], 'size': row[1], 'fingerprint': row[2],
+            'columns': json.loads(row[3]), 'high_water': datetime.fromisoformat(row[4]),
+        }
+
+    def record(self, path: str, columns: List[str], high_water: datetime,
+               positions: Iterable[Tuple[int, int]], replace: bool) -> int:
+        """
+        Record the state of a file after a sync.
+
+        Args:
+            path: The synced file
+            columns: Its header
+            high_water: Changes made at or after this time are picked up by the next sync
+            positions: (email hash, byte position) of rows that are new to the index
+            replace: Drop the positions recorded before (after a full sync)
+
+        Returns:
+            int: The file's id
+        """
+        path = os.path.abspath(path)
+        size = os.path.getsize(path)
+        conn = connect(self.db_path)
+        try:
+            conn.execute(
+                'INSERT INTO sync_files (path, size, fingerprint, columns, high_water, synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (path) DO UPDATE SET size = excluded.size, '
+                'fingerprint = excluded.fingerprint, columns = excluded.columns, '
+                'high_water = excluded.high_water, synced_at = excluded.synced_at',
+                (path, size, fingerprint(path, size), json.dumps(columns), high_water, datetime.now())
+            )
+            file_id = conn.execute('SELECT id FROM sync_files WHERE path = ?', (path,)).fetchone()[0]
+            if replace:
+                conn.execute('DELETE FROM sync_rows WHERE file_id = ?', (file_id,))
+
+            chunk = []
+            for hash_value, position in positions:
+                chunk.append((file_id, hash_value, position))
+                if len(chunk) >= POSITION_CHUNK_SIZE:
+                    conn.executemany('INSERT OR IGNORE INTO sync_rows VALUES (?, ?, ?)', chunk)
+                    chunk.clear()
+            conn.executemany('INSERT OR IGNORE INTO sync_rows VALUES (?, ?, ?)', chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return file_id
+
+    def positions(self, file_id: int, emails: Iterable[str]) -> Dict[str, List[int]]:
+        """
+        Look up where the rows of many addresses are in a synced file.
+
+        Returns:
+            Dict mapping each address found to the byte positions of its rows
+        """
+        by_hash = {email_hash(email): email for email in emails if email}
+        hashes = list(by_hash)
+        found = {}
+        conn = connect(self.db_path)
+        for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            chunk = hashes[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT email_hash, position FROM sync_rows WHERE file_id = ? AND email_hash IN ({placeholders})',
+                [file_id] + chunk
+            ).fetchall()
+            for hash_value, position in rows:
+                found.setdefault(by_hash[hash_value], []).append(position)
+        conn.close()
+        return found
@@ -0,0 +1,268 @@
+"""
+Versioned schema migrations for the subscriber database.
+
+Every script opens the database through connect(), which sets performance
+pragmas and applies any migrations the file hasn't seen yet. The schema
+version is stored in SQLite's user_version pragma.
+
+To add a schema change, append a new function to MIGRATIONS. Never edit a
+migration that has already shipped.
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import List
+
+from batch_email.emails import migrate_email_index
+
+DEFAULT_DB_PATH = 'email_subscribers.db'
+
+# Applied to every connection
+CONNECTION_PRAGMAS = [
+    'PRAGMA synchronous = NORMAL',   # safe with WAL, far fewer fsyncs
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',    # 64 MB page cache
+    'PRAGMA mmap_size = 268435456',  # 256 MB memory-mapped I/O
+]
+
+# Seconds to wait for a lock held by another process before failing
+BUSY_TIMEOUT = 30
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def _create_base_tables(conn):
+    """Create the subscribers and unsubscribe_reasons tables"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS subscribers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE,
+        first_name TEXT,
+        last_name TEXT,
+        subscribed BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP,
+        email_hash INTEGER
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS unsubscribe_reasons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT,
+        reason TEXT,
+        comments TEXT,
+        preference TEXT,
+        unsubscribed_at TIMESTAMP
+    )
+    ''')
+
+
+def _add_email_hash_index(conn):
+    """Normalize stored emails and add the (email_hash, subscribed) covering index"""
+    migrate_email_index(conn)
+
+
+def _add_lookup_indexes(conn):
+    """Add the indexes that databases created by the Flask app and sync script were missing"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_subscribers_subscribed ON subscribers(subscribed)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_subscribers_updated_at ON subscribers(updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_unsubscribe_reasons_email ON unsubscribe_reasons(email)')
+
+
+def _create_import_jobs(conn):
+    """Create the table that tracks background import jobs"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT,
+        spool_path TEXT,
+        status TEXT,
+        rows_total INTEGER DEFAULT 0,
+        rows_processed INTEGER DEFAULT 0,
+        rows_imported INTEGER DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+
+
+def _add_import_duplicate_count(conn):
+    """Track how many duplicate rows each import job skipped"""
+    conn.execute('ALTER TABLE import_jobs ADD COLUMN rows_duplicate INTEGER DEFAULT 0')
+
+
+def _create_campaigns(conn):
+    """Create the table of campaigns scheduled for the queue runner"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS campaigns (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        csv_path TEXT,
+        html_template TEXT,
+        text_template TEXT,
+        subject_template TEXT,
+        options TEXT,
+        priority INTEGER DEFAULT 0,
+        rate_limit REAL,
+        start_at TIMESTAMP,
+        status TEXT,
+        rows_done INTEGER DEFAULT 0,
+        sent INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        skipped INTEGER DEFAULT 0,
+        duplicates INTEGER DEFAULT 0,
+        invalid INTEGER DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMP,
+        started_at TIMESTAMP,
+        last_run_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_campaigns_status ON campaigns(status, priority)')
+
+
+def _create_sync_state(conn):
+    """Create the tables that track incremental CSV syncs"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sync_files (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE,
+        size INTEGER,
+        fingerprint TEXT,
+        columns TEXT,
+        high_water TIMESTAMP,
+        synced_at TIMESTAMP
+    )
+    ''')
+    # Byte position of every row of a synced file, found by the row's email hash
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sync_rows (
+        file_id INTEGER,
+        email_hash INTEGER,
+        position INTEGER,
+        PRIMARY KEY (file_id, email_hash, position)
+    ) WITHOUT ROWID
+    ''')
+
+
+# Ordered list of migrations; the schema version is the number applied
+MIGRATIONS = [
+    _create_base_tables,
+    _add_email_hash_index,
+    _add_lookup_indexes,
+    _create_import_jobs,
+    _add_import_duplicate_count,
+    _create_campaigns,
+    _create_sync_state,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn) -> int:
+    """Return the schema version recorded in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn) -> List[int]:
+    """
+    Apply all migrations newer than the database's schema version.
+
+    Each migration runs in its own transaction together with the version bump.
+
+    Args:
+        conn: SQLite connection to the subscriber database
+
+    Returns:
+        List of migration versions that were applied
+    """
+    # Persistent setting: readers no longer block the writer
+    conn.execute('PRAGMA journal_mode = WAL')
+
+    applied = []
+    version = get_version(conn)
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        # Take the write lock first so concurrent processes don't both migrate
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_version(conn) >= number:
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logging.info(f"Applied database migration {number}: {migration.__doc__}")
+        applied.append(number)
+    return applied
+
+
+def connect(db_path: str = DEFAULT_DB_PATH):
+    """
+    Open a connection to the subscriber database.
+
+    Sets the performance pragmas and, the first time a path is opened in this
+    process, brings the schema up to date.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    if db_path == ':memory:':
+        # Every in-memory connection is a new, empty database
+        apply_migrations(conn)
+    elif db_path not in _migrated_paths:
+        with _migrate_lock:
+            if db_path not in _migrated_paths:
+                apply_migrations(conn)
+                _migrated_paths.add(db_path)
+    return conn
+
+
+def init_db(db_path: str = DEFAULT_DB_PATH) -> List[int]:
+    """
+    Create or upgrade the subscriber database.
+
+    Returns:
+        List of migration versions that were applied
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        applied = apply_migrations(conn)
+    finally:
+        conn.close()
+    _migrated_paths.add(db_path)
+    return applied
+
+
+def analyze(db_path: str = DEFAULT_DB_PATH, analysis_limit: int = 1000):
+    """
+    Refresh the query planner statistics without blocking readers.
+
+    Args:
+        db_path: Path to the SQLite database file
+        analysis_limit: Rows sampled per index (0 = scan everything); a small
+                        limit keeps ANALYZE fast on very large tables
+    """
+    conn = connect(db_path)
+    try:
+        conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
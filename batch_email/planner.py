@@ -0,0 +1,113 @@
+"""
+Cost and time estimates for a campaign, without sending it.
+
+The sender runs its normal pipeline (read, dedup, validation, suppression,
+rendering) in dry-run mode and hands every SMTP transaction it would make to a
+CampaignPlanner instead of the SMTP server. Only the first few messages are
+built as real MIME messages; their average size, corrected for how much
+longer or shorter each rendered body is than the sample's, is used to estimate
+the size of all the others.
+"""
+
+from typing import Dict, List
+
+# Rough time for one SMTP transaction (MAIL FROM, RCPT TO..., DATA) over an
+# established connection. Measure your own server and pass the real value.
+DEFAULT_TRANSACTION_SECONDS = 0.3
+
+# Messages built as real MIME messages to measure encoding overhead
+DEFAULT_SAMPLE_SIZE = 20
+
+# Bytes of SMTP commands and replies per transaction, excluding the message
+# and the RCPT TO lines: "MAIL FROM:<...>", "DATA", "." and the server replies
+TRANSACTION_OVERHEAD = 120
+
+# "RCPT TO:<>\r\n" plus a "250 2.1.5 OK\r\n" reply, excluding the address
+RECIPIENT_OVERHEAD = 26
+
+
+class CampaignPlanner:
+    def __init__(self, sender_address: str, delay: float, delay_after_last: bool,
+                 transaction_seconds: float = DEFAULT_TRANSACTION_SECONDS,
+                 sample_size: int = DEFAULT_SAMPLE_SIZE):
+        """
+        Initialize the planner.
+
+        Args:
+            sender_address: Envelope sender (counted in MAIL FROM)
+            delay: Seconds the sender sleeps between transactions
+            delay_after_last: Whether the sender also sleeps after the last transaction
+            transaction_seconds: Estimated time per SMTP transaction
+            sample_size: Number of messages built in full to measure their size
+        """
+        self.sender_address = sender_address
+        self.delay = delay
+        self.delay_after_last = delay_after_last
+        self.transaction_seconds = transaction_seconds
+        self.sample_size = sample_size
+        self.transactions = 0
+        self.recipients = 0
+        self.body_chars = 0
+        self.envelope_bytes = 0
+        self._sample_bytes = 0
+        self._sample_chars = 0
+        self._base64 = False
+        self.samples = []
+
+    def record(self, message_builder, body_chars: int, recipients: List[str]):
+        """
+        Account for one SMTP transaction.
+
+        Args:
+            message_builder: Callable returning the MIME message; only called for the sample
+            body_chars: Length of the rendered subject and bodies
+            recipients: Envelope recipients of the transaction
+        """
+        if len(self.samples) < self.sample_size:
+            message = message_builder().as_string()
+            self.samples.append(message)
+            self._sample_bytes += len(message.encode('utf-8'))
+            self._sample_chars += body_chars
+            # Non-ASCII bodies are base64 encoded, which grows them by a third
+            self._base64 = self._base64 or 'Content-Transfer-Encoding: base64' in message
+
+        self.transactions += 1
+        self.recipients += len(recipients)
+        self.body_chars += body_chars
+        self.envelope_bytes += (TRANSACTION_OVERHEAD + len(self.sender_address)
+                                + sum(RECIPIENT_OVERHEAD + len(address) for address in recipients))
+
+    @property
+    def message_bytes(self) -> int:
+        """Estimated total size of the message data (DATA sections)"""
+        sampled = len(self.samples)
+        if not sampled:
+            return 0
+        average_bytes = self._sample_bytes / sampled
+        extra_chars = self.body_chars - self.transactions * self._sample_chars / sampled
+        return int(self.transactions * average_bytes + extra_chars * (4 / 3 if self._base64 else 1))
+
+    @property
+    def estimated_seconds(self) -> float:
+        """Estimated wall-clock time of the send, including the configured delays"""
+        delays = self.transactions if self.delay_after_last else max(self.transactions - 1, 0)
+        return self.transactions * self.transaction_seconds + delays * self.delay
+
+    def as_dict(self) -> Dict:
+        """Summary of the plan"""
+        return {
+            'transactions': self.transactions,
+            'recipients': self.recipients,
+            'bytes': self.message_bytes + self.envelope_bytes,
+            'message_bytes': self.message_bytes,
+            'estimated_seconds': round(self.estimated_seconds, 1),
+        }
+
+    def report(self) -> str:
+        """One-line summary of the plan"""
+        seconds = int(self.estimated_seconds)
+        hours, rest = divmod(seconds, 3600)
+        return (f"{self.transactions} SMTP transactions to {self.recipients} recipients, "
+                f"{(self.message_bytes + self.envelope_bytes) / 1e6:.1f} MB on the wire, "
+                f"estimated {hours}h {rest // 60:02d}m {rest % 60:02d}s "
+                f"({self.transaction_seconds}s per transaction, {self.delay}s delay)")
@@ -0,0 +1,371 @@
+"""
+Compiled recipient files.
+
+A recipient CSV can be compiled once into a binary file that is read through
+mmap, so repeat campaigns over the same list skip CSV parsing entirely. Every
+column is stored separately as a string table: an array of row_count + 1 byte
+offsets followed by the UTF-8 values, each terminated by a NUL byte so a whole
+range can be decoded and split in one call. Any value of any row can
+be read without touching the others, and a range of rows (a shard) is just a
+pair of offsets into the same mapping. A bitmap holds each row's subscription
+status and can be refreshed in place.
+
+Layout (header and directory little-endian, offset arrays in the byte order
+recorded in the header, sections 8-byte aligned):
+
+    header     magic, byte order, column count, row count, bitmap offset, directory offset
+    columns    per column: offsets (row_count + 1 x uint64), then the NUL-terminated UTF-8 values
+    bitmap     one bit per row, 1 = subscribed
+    directory  per column: name length (uint16), name, offsets position, values position, flags
+"""
+
+import csv
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from batch_email.compression import open_text
+from batch_email.emails import normalize_email
+
+MAGIC = b'BERCPT01'
+FILE_EXTENSION = '.brf'
+
+# magic, byte order ('<' or '>'), padding, column count, row count, bitmap offset, directory offset
+HEADER = struct.Struct('<8sc3xIQQQ')
+DIRECTORY_ENTRY = struct.Struct('<QQQ')
+
+# Column flag: no value contains a NUL byte, so ranges can be split on NUL
+FLAG_SPLITTABLE = 1
+
+# Values of a 'subscribed' CSV column that mean unsubscribed
+UNSUBSCRIBED_VALUES = {'0', 'false', 'no', 'n', 'unsubscribed'}
+
+# Rows per store lookup when reading statuses from the database
+STATUS_CHUNK_SIZE = 5000
+
+# Rows decoded at a time when iterating over a range
+ROWS_PER_CHUNK = 65536
+
+
+def is_recipient_file(path: str) -> bool:
+    """Return True if path is a compiled recipient file (checked by its magic bytes)"""
+    try:
+        with open(path, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def load_rows(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    """
+    Read all rows of a recipient CSV (plain, .gz or .zst) or compiled recipient file.
+
+    Returns:
+        Tuple of (column names, list of row dicts)
+    """
+    if is_recipient_file(path):
+        with RecipientFile(path) as recipients:
+            return list(recipients.columns), list(recipients.rows())
+
+    with open_text(path) as file:
+        reader = csv.DictReader(file)
+        rows = list(reader)
+        return list(reader.fieldnames or []), rows
+
+
+def _align(file):
+    """Pad a file being written to the next multiple of 8 bytes"""
+    padding = -file.tell() % 8
+    if padding:
+        file.write(b'\0' * padding)
+
+
+def compile_recipients(csv_rows: Iterable[Dict[str, str]], columns: List[str], output_path: str,
+                       store=None) -> int:
+    """
+    Compile recipient rows into a recipient file.
+
+    The rows are streamed: values are spooled to one temporary file per column
+    and copied into place at the end, so memory use doesn't grow with the list.
+
+    Args:
+        csv_rows: Rows as produced by csv.DictReader
+        columns: Column names (csv.DictReader.fieldnames)
+        output_path: File to write
+        store: Subscriber store to take subscription statuses from (optional; without
+               it the 'subscribed' column is used, and rows without one count as subscribed)
+
+    Returns:
+        int: Number of rows written
+    """
+    columns = list(columns)
+    use_store = store is not None and 'email' in columns
+    has_subscribed_column = 'subscribed' in columns
+
+    spool_dir = tempfile.mkdtemp(prefix='recipients-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        values = [open(os.path.join(spool_dir, f"{index}.values"), 'w+b') for index in range(len(columns))]
+        offsets = [open(os.path.join(spool_dir, f"{index}.offsets"), 'w+b') for index in range(len(columns))]
+        positions = [0] * len(columns)
+        splittable = [True] * len(columns)
+        pending_offsets = [array('Q', [0]) for _ in columns]
+        bitmap = bytearray()
+        pending_emails = []
+        row_count = 0
+
+        def flush_offsets():
+            for index, pending in enumerate(pending_offsets):
+                pending.tofile(offsets[index])
+                del pending[:]
+
+        def flush_statuses():
+            status = store.lookup(pending_emails)
+            start = row_count - len(pending_emails)
+            for number, email in enumerate(pending_emails, start=start):
+                # Addresses the store doesn't know are treated as subscribed
+                if status.get(normalize_email(email), True):
+                    bitmap[number >> 3] |= 1 << (number & 7)
+            pending_emails.clear()
+
+        for row in csv_rows:
+            encoded = [(row.get(name) or '').encode('utf-8') for name in columns]
+            for index, value in enumerate(encoded):
+                if b'\0' in value:
+                    splittable[index] = False
+                values[index].write(value + b'\0')
+                positions[index] += len(value) + 1
+                pending_offsets[index].append(positions[index])
+
+            if row_count % 8 == 0:
+                bitmap.append(0)
+            if use_store:
+                pending_emails.append(row.get('email') or '')
+            elif not has_subscribed_column or (row.get('subscribed') or '').strip().lower() not in UNSUBSCRIBED_VALUES:
+                bitmap[row_count >> 3] |= 1 << (row_count & 7)
+            row_count += 1
+
+            if row_count % STATUS_CHUNK_SIZE == 0:
+                flush_offsets()
+                if use_store:
+                    flush_statuses()
+        flush_offsets()
+        if use_store and pending_emails:
+            flush_statuses()
+
+        with open(output_path, 'wb') as output:
+            output.write(b'\0' * HEADER.size)
+            entries = []
+            for index in range(len(columns)):
+                _align(output)
+                offsets_position = output.tell()
+                offsets[index].seek(0)
+                shutil.copyfileobj(offsets[index], output, 1024 * 1024)
+                values_position = output.tell()
+                values[index].seek(0)
+                shutil.copyfileobj(values[index], output, 1024 * 1024)
+                entries.append((offsets_position, values_position,
+                                FLAG_SPLITTABLE if splittable[index] else 0))
+
+            _align(output)
+            bitmap_position = output.tell()
+            output.write(bitmap)
+
+            _align(output)
+            directory_position = output.tell()
+            for name, entry in zip(columns, entries):
+                encoded_name = name.encode('utf-8')
+                output.write(struct.pack('<H', len(encoded_name)) + encoded_name)
+                output.write(DIRECTORY_ENTRY.pack(*entry))
+
+            output.seek(0)
+            byte_order = b'<' if sys.byteorder == 'little' else b'>'
+            output.write(HEADER.pack(MAGIC, byte_order, len(columns), row_count,
+                                     bitmap_position, directory_position))
+
+        for file in values + offsets:
+            file.close()
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return row_count
+
+
+class RecipientFile:
+    def __init__(self, path: str, writable: bool = False):
+        """
+        Open a compiled recipient file.
+
+        Args:
+            path: File written by compile_recipients()
+            writable: Map the file writable so the subscribed bitmap can be updated in place
+        """
+        self.path = path
+        self._file = open(path, 'r+b' if writable else 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._offsets = {}
+        self._bitmap = None
+
+        magic, byte_order, column_count, self.row_count, bitmap_position, directory_position = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a compiled recipient file")
+        if byte_order != (b'<' if sys.byteorder == 'little' else b'>'):
+            self.close()
+            raise ValueError(f"{path} was compiled on a machine with a different byte order")
+
+        self.columns = []
+        self._values = {}
+        self._splittable = {}
+        position = directory_position
+        for _ in range(column_count):
+            name_length, = struct.unpack_from('<H', self._mmap, position)
+            name = bytes(self._mmap[position + 2:position + 2 + name_length]).decode('utf-8')
+            position += 2 + name_length
+            offsets_position, values_position, flags = DIRECTORY_ENTRY.unpack_from(self._mmap, position)
+            position += DIRECTORY_ENTRY.size
+
+            self.columns.append(name)
+            end = offsets_position + 8 * (self.row_count + 1)
+            self._offsets[name] = self._view[offsets_position:end].cast('Q')
+            self._values[name] = values_position
+            self._splittable[name] = bool(flags & FLAG_SPLITTABLE)
+
+        self._bitmap = self._view[bitmap_position:bitmap_position + (self.row_count + 7) // 8]
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def raw(self, index: int, column: str) -> memoryview:
+        """Return a value as a zero-copy view of its UTF-8 bytes"""
+        offsets = self._offsets[column]
+        start = self._values[column]
+        return self._view[start + offsets[index]:start + offsets[index + 1] - 1]
+
+    def value(self, index: int, column: str) -> str:
+        """Return one value of one row"""
+        offsets = self._offsets[column]
+        start = self._values[column]
+        return self._mmap[start + offsets[index]:start + offsets[index + 1] - 1].decode('utf-8')
+
+    def row(self, index: int) -> Dict[str, str]:
+        """Return one row as a dict, like csv.DictReader would"""
+        if not 0 <= index < self.row_count:
+            raise IndexError(index)
+        return {column: self.value(index, column) for column in self.columns}
+
+    def column_values(self, name: str, start: int = 0, stop: int = None) -> List[str]:
+        """Return the values of one column for a range of rows"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        if start >= stop:
+            return []
+        offsets = self._offsets[name]
+        base = self._values[name]
+        blob = self._mmap[base + offsets[start]:base + offsets[stop]]
+        if self._splittable[name]:
+            # Decode the whole range at once and split on the terminators
+            values = blob.decode('utf-8').split('\0')
+            values.pop()
+            return values
+        bounds = [offset - offsets[start] for offset in offsets[start:stop + 1].tolist()]
+        return [blob[a:b - 1].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+    def column(self, name: str, start: int = 0, stop: int = None) -> Iterator[str]:
+        """Yield the values of one column for a range of rows, a chunk at a time"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        for chunk_start in range(start, stop, ROWS_PER_CHUNK):
+            yield from self.column_values(name, chunk_start, min(chunk_start + ROWS_PER_CHUNK, stop))
+
+    def rows(self, start: int = 0, stop: int = None) -> Iterator[Dict[str, str]]:
+        """Yield rows as dicts for a range of rows"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        names = self.columns
+        for chunk_start in range(start, stop, ROWS_PER_CHUNK):
+            chunk_stop = min(chunk_start + ROWS_PER_CHUNK, stop)
+            columns = [self.column_values(name, chunk_start, chunk_stop) for name in names]
+            for values in zip(*columns):
+                yield dict(zip(names, values))
+
+    def shard(self, number: int, count: int) -> Tuple[int, int]:
+        """
+        Return the (start, stop) row range of one of count equal shards.
+
+        Shards share the mapping, so workers can each read their own range of one file.
+        """
+        size = -(-self.row_count // count)
+        return min(number * size, self.row_count), min((number + 1) * size, self.row_count)
+
+    def is_subscribed(self, index: int) -> bool:
+        """Return the subscription status recorded for a row"""
+        return bool(self._bitmap[index >> 3] & (1 << (index & 7)))
+
+    def subscribed_rows(self, start: int = 0, stop: int = None) -> Iterator[int]:
+        """Yield the indexes of the subscribed rows in a range"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        bitmap = self._bitmap
+        for index in range(start, stop):
+            if bitmap[index >> 3] & (1 << (index & 7)):
+                yield index
+
+    def set_subscribed(self, index: int, subscribed: bool):
+        """Update a row's subscription status in place (requires writable=True)"""
+        if subscribed:
+            self._bitmap[index >> 3] |= 1 << (index & 7)
+        else:
+            self._bitmap[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def refresh_subscribed(self, store) -> Tuple[int, List[Tuple[str, str, str]]]:
+        """
+        Update the subscribed bitmap from the subscriber store (requires writable=True).
+
+        Addresses the store doesn't know are marked subscribed and returned so
+        the caller can add them.
+
+        Returns:
+            Tuple of (number of unsubscribed rows, list of (email, first_name, last_name) not in the store)
+        """
+        unsubscribed = 0
+        unknown = []
+        has_names = 'first_name' in self.columns and 'last_name' in self.columns
+        for start in range(0, self.row_count, STATUS_CHUNK_SIZE):
+            stop = min(start + STATUS_CHUNK_SIZE, self.row_count)
+            emails = list(self.column('email', start, stop))
+            status = store.lookup(emails)
+            for index, email in enumerate(emails, start=start):
+                normalized = normalize_email(email)
+                if not normalized:
+                    self.set_subscribed(index, True)
+                    continue
+                if normalized not in status:
+                    status[normalized] = True
+                    names = (self.value(index, 'first_name'), self.value(index, 'last_name')) if has_names else ('', '')
+                    unknown.append((normalized,) + names)
+                self.set_subscribed(index, status[normalized])
+                if not status[normalized]:
+                    unsubscribed += 1
+        self._mmap.flush()
+        return unsubscribed, unknown
+
+    def close(self):
+        """Release the mapping and the file"""
+        for view in list(self._offsets.values()) + [self._bitmap]:
+            if view is not None:
+                view.release()
+        self._offsets = {}
+        self._bitmap = None
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
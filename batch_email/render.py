@@ -0,0 +1,170 @@
+"""
+Render cache for personalized campaign content.
+
+Most recipients of a campaign share every template input except their name and
+address. Templates are rendered once per distinct set of the shared values
+they reference (other columns, such as ids, are ignored) and split into static
+fragments around the personal slots; rendering a recipient then only joins
+those fragments with the recipient's own values.
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Row fields that differ per recipient
+PERSONAL_FIELDS = ('email', 'first_name', 'last_name')
+
+# Generic unsubscribe link used in templates; it becomes a per-recipient slot
+UNSUBSCRIBE_URL_PLACEHOLDER = "https://example.com/unsubscribe?email={email}"
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def read_template(path: str) -> Optional[str]:
+    """Read a template file, or return None if no path was given"""
+    if not path:
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+class CompiledTemplate:
+    def __init__(self, parts: List[str], slots: List[str]):
+        """
+        A template split into static text and named slots.
+
+        parts has one more entry than slots: parts[0] + value(slots[0]) + parts[1] + ...
+        """
+        self.parts = parts
+        self.slots = slots
+
+    @classmethod
+    def compile(cls, template: Optional[str], shared: Dict[str, str],
+                personal_fields: Tuple[str, ...]) -> Optional['CompiledTemplate']:
+        """
+        Fill in the shared values and split the result around the personal slots.
+
+        Args:
+            template: Template text with {placeholders} (None for no template)
+            shared: Values that are the same for every recipient in this cache entry
+            personal_fields: Personal fields present in the recipient rows
+
+        Returns:
+            CompiledTemplate, or None if template is None
+        """
+        if template is None:
+            return None
+
+        text = template
+        for key, value in shared.items():
+            text = text.replace(f"{{{key}}}", value)
+
+        slot_names = {f"{{{field}}}": field for field in personal_fields}
+        tokens = []
+        if 'email' in personal_fields:
+            slot_names[UNSUBSCRIBE_URL_PLACEHOLDER] = 'unsubscribe_url'
+            tokens.append(UNSUBSCRIBE_URL_PLACEHOLDER)
+        tokens.extend(f"{{{field}}}" for field in personal_fields)
+
+        if not tokens:
+            return cls([text], [])
+
+        # Longest token first so the unsubscribe URL wins over the {email} inside it
+        pattern = re.compile('(' + '|'.join(re.escape(token) for token in sorted(tokens, key=len, reverse=True)) + ')')
+        pieces = pattern.split(text)
+        return cls(pieces[0::2], [slot_names[token] for token in pieces[1::2]])
+
+    def render(self, values: Dict[str, str]) -> str:
+        """Join the static parts with the recipient's values"""
+        if not self.slots:
+            return self.parts[0]
+        out = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            out.append(values[slot])
+            out.append(part)
+        return ''.join(out)
+
+
+class RenderCache:
+    def __init__(self, html_template: str, text_template: str = None, subject_template: str = None,
+                 maxsize: int = DEFAULT_CACHE_SIZE, personal_fields: Tuple[str, ...] = PERSONAL_FIELDS):
+        """
+        Cache compiled templates keyed on the non-personal fields the templates use.
+
+        Args:
+            html_template: HTML template with {placeholders}
+            text_template: Plain text template (optional)
+            subject_template: Subject template (optional)
+            maxsize: Maximum number of cached variants (least recently used are evicted)
+            personal_fields: Row fields that vary per recipient
+        """
+        self.html_template = html_template
+        self.text_template = text_template
+        self.subject_template = subject_template
+        self.maxsize = maxsize
+        self.personal_fields = personal_fields
+        # Only the placeholders the templates contain decide which variant a row needs
+        placeholders = set()
+        for template in (html_template, text_template, subject_template):
+            if template:
+                placeholders.update(re.findall(r'\{([^{}]+)\}', template))
+        self.shared_fields = tuple(sorted(placeholders - set(personal_fields)))
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, row: Dict[str, str]) -> Tuple[CompiledTemplate, Optional[CompiledTemplate], Optional[CompiledTemplate]]:
+        """Return the compiled (html, text, subject) templates for a row's shared values"""
+        shared = tuple((field, row[field]) for field in self.shared_fields if field in row)
+        present = tuple(field for field in self.personal_fields if field in row)
+        key = (shared, present)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        values = {key: value or '' for key, value in shared}
+        entry = (
+            CompiledTemplate.compile(self.html_template, values, present),
+            CompiledTemplate.compile(self.text_template, values, present),
+            CompiledTemplate.compile(self.subject_template, values, present),
+        )
+        self._entries[key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def render(self, row: Dict[str, str], unsubscribe_url: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        Render the (html, text, subject) for one recipient.
+
+        Args:
+            row: Recipient row from the CSV
+            unsubscribe_url: This recipient's unsubscribe link
+
+        Returns:
+            Tuple of (html, text, subject); text and subject are None without a template
+        """
+        html, text, subject = self.get(row)
+        values = {field: row[field] or '' for field in self.personal_fields if field in row}
+        values['unsubscribe_url'] = unsubscribe_url
+        return (
+            html.render(values) if html else None,
+            text.render(values) if text else None,
+            subject.render(values) if subject else None,
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        """One-line summary of cache effectiveness"""
+        return (f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate), "
+                f"{len(self._entries)} cached variants")
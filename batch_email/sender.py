@@ -0,0 +1,682 @@
+"""
+Batch email sending over SMTP.
+
+BatchEmailSender reads a recipient list, drops duplicates, malformed and
+unsubscribed addresses, renders the templates and sends the emails, either in
+BCC batches or one per recipient. smtplib and email.mime are only imported
+once a message is actually built or sent.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List
+from urllib.parse import quote
+
+from batch_email.dedup import Deduplicator
+from batch_email.emails import normalize_email
+from batch_email.planner import DEFAULT_TRANSACTION_SECONDS, CampaignPlanner
+from batch_email.recipient_file import load_rows
+from batch_email.render import DEFAULT_CACHE_SIZE, RenderCache, read_template
+from batch_email.validation import AddressValidator
+from batch_email.store import SubscriberStore, open_store
+from batch_email.tokens import TokenSigner
+from batch_email.tracing import NULL_TRACER, Tracer
+
+if TYPE_CHECKING:
+    # Imported when a message is built (see build_message)
+    from email.mime.multipart import MIMEMultipart
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def unsubscribe_url(email, token=None):
+    """
+    Return the personalized unsubscribe link for a recipient.
+
+    Args:
+        email: Recipient's email address
+        token: Signed unsubscribe token for the recipient (optional). Links with a
+               token don't expose the address and can't be forged.
+    """
+    if token:
+        return f"https://example.com/unsubscribe?t={token}"
+    return f"https://example.com/unsubscribe?email={quote(email, safe='@')}"
+
+
+def one_click_unsubscribe_url(token):
+    """Return the RFC 8058 one-click unsubscribe endpoint for a signed token"""
+    return f"https://example.com/unsubscribe/one-click?t={token}"
+
+
+def update_unsubscribe_links(html_content, text_content, email):
+    """
+    Update unsubscribe links in email content to include the recipient's email.
+
+    Args:
+        html_content: HTML email content
+        text_content: Plain text email content
+        email: Recipient's email address
+
+    Returns:
+        Tuple of (updated_html, updated_text)
+    """
+    personalized_url = unsubscribe_url(email)
+
+    if html_content:
+        # Replace generic unsubscribe URL with personalized one in HTML
+        html_content = html_content.replace(
+            "https://example.com/unsubscribe?email={email}",
+            personalized_url
+        )
+
+    if text_content:
+        # Replace generic unsubscribe URL with personalized one in text
+        text_content = text_content.replace(
+            "https://example.com/unsubscribe?email={email}",
+            personalized_url
+        )
+
+    return html_content, text_content
+
+
+class BatchEmailSender:
+    def __init__(self, smtp_server: str, port: int, email: str, password: str,
+                 store: SubscriberStore = None, token_signer: TokenSigner = None):
+        """
+        Initialize the email sender with SMTP server details.
+
+        Args:
+            smtp_server: SMTP server address (e.g., 'smtp.gmail.com')
+            port: SMTP port (typically 587 for TLS)
+            email: Your email address
+            password: Your app password from Google Account -> Security -> App passwords
+                     (With 2-step verification enabled, regular passwords won't work)
+            store: Subscriber store used for unsubscribe checks (optional, defaults to
+                   open_store(), i.e. SUBSCRIBER_STORE or the local SQLite database)
+            token_signer: Signs the unsubscribe tokens put in individual emails (optional,
+                          defaults to one using UNSUBSCRIBE_SECRET; without a secret the
+                          links carry the address instead)
+        """
+        self.smtp_server = smtp_server
+        self.port = port
+        self.email = email
+        self.password = password
+        self.session = None
+        self.store = store
+        self.token_signer = token_signer or TokenSigner.from_env()
+        # Records per-stage timings while send_batch_from_csv(trace_path=...) runs
+        self.tracer = NULL_TRACER
+        if self.token_signer is None:
+            logging.warning("UNSUBSCRIBE_SECRET is not set, unsubscribe links will contain email addresses")
+
+    def connect(self):
+        """Establish connection to the SMTP server."""
+        try:
+            # Imported here so commands that never send don't pay for it
+            import smtplib
+
+            # Create SMTP session
+            self.session = smtplib.SMTP(self.smtp_server, self.port)
+            self.session.ehlo()
+            # Start TLS encryption
+            self.session.starttls()
+            # Re-identify ourselves over TLS connection
+            self.session.ehlo()
+            # Login to server
+            self.session.login(self.email, self.password)
+            logging.info("Successfully connected to SMTP server")
+            return True
+        except Exception as e:
+            logging.error(f"Connection error: {str(e)}")
+            return False
+
+    def disconnect(self):
+        """Close the SMTP connection."""
+        if self.session:
+            self.session.quit()
+            self.session = None
+            logging.info("Disconnected from SMTP server")
+
+    def check_subscription_status(self, email_list: List[str]) -> Dict[str, bool]:
+        """
+        Check which emails are subscribed and which are unsubscribed.
+
+        Args:
+            email_list: List of email addresses to check
+
+        Returns:
+            Dict mapping email addresses to subscription status (True=subscribed, False=unsubscribed)
+        """
+        # Connect to the subscription database
+        try:
+            if self.store is None:
+                self.store = open_store()
+
+            # Look up all emails at once
+            found = self.store.lookup(email_list)
+
+            # Prepare a dictionary to hold results
+            subscription_status = {}
+
+            for email in email_list:
+                normalized = normalize_email(email)
+                if normalized not in found:
+                    # Email not found in database, default to unsubscribed to be safe
+                    subscription_status[email] = False
+                    logging.warning(f"Email not found in subscriber database: {email}")
+                else:
+                    # Email found, set status based on database value
+                    subscription_status[email] = found[normalized]
+
+            return subscription_status
+
+        except Exception as e:
+            logging.error(f"Error checking subscription status: {str(e)}")
+            # If there's an error, return all as unsubscribed to be safe
+            return {email: False for email in email_list}
+
+    def unsubscribe_tokens(self, email_list: List[str]) -> Dict[str, str]:
+        """
+        Create signed unsubscribe tokens for many recipients at once.
+
+        Args:
+            email_list: List of email addresses
+
+        Returns:
+            Dict mapping normalized addresses to tokens. Addresses that aren't in the
+            subscriber database (or all of them, if no token secret is set) are omitted.
+        """
+        if self.token_signer is None:
+            return {}
+
+        try:
+            if self.store is None:
+                self.store = open_store()
+
+            return self.token_signer.sign_many(self.store.get_subscriber_ids(email_list))
+
+        except Exception as e:
+            logging.error(f"Error creating unsubscribe tokens: {str(e)}")
+            return {}
+
+    def filter_unsubscribed(self, email_list: List[str]) -> List[str]:
+        """
+        Filter out unsubscribed email addresses.
+
+        Args:
+            email_list: List of email addresses to filter
+
+        Returns:
+            List of subscribed email addresses only
+        """
+        status_dict = self.check_subscription_status(email_list)
+        return [email for email in email_list if status_dict.get(email, False)]
+
+    def build_message(self, recipient: str, subject: str, body_html: str, body_text: str = None,
+                      list_unsubscribe: str = None, one_click: bool = False) -> 'MIMEMultipart':
+        """
+        Build the MIME message for one email (see send_email for the arguments).
+
+        Returns:
+            MIMEMultipart: The message, ready to be sent
+        """
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        # Create message container
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.email
+        msg['To'] = recipient
+        msg['Subject'] = subject
+
+        # Let mail clients show their own unsubscribe button
+        if list_unsubscribe:
+            msg['List-Unsubscribe'] = f"<{list_unsubscribe}>"
+            if one_click:
+                msg['List-Unsubscribe-Post'] = "List-Unsubscribe=One-Click"
+
+        # Attach parts to the message
+        if body_text:
+            msg.attach(MIMEText(body_text, 'plain'))
+        msg.attach(MIMEText(body_html, 'html'))
+        return msg
+
+    def send_email(self, recipient: str, subject: str, body_html: str,
+                   body_text: str = None, bcc: List[str] = None,
+                   list_unsubscribe: str = None, one_click: bool = False) -> bool:
+        """
+        Send a single email.
+
+        Args:
+            recipient: Recipient email address
+            subject: Email subject
+            body_html: HTML content of the email
+            body_text: Plain text version (optional)
+            bcc: List of BCC recipients (optional)
+            list_unsubscribe: URL for the List-Unsubscribe header (optional)
+            one_click: If True, also advertise RFC 8058 one-click unsubscribe
+                       (list_unsubscribe must then be a POST endpoint that needs no login)
+
+        Returns:
+            bool: True if email was sent successfully, False otherwise
+        """
+        if not self.session:
+            if not self.connect():
+                return False
+
+        try:
+            with self.tracer.span('mime'):
+                msg = self.build_message(recipient, subject, body_html, body_text, list_unsubscribe, one_click)
+                message = msg.as_string()
+
+            # Set BCC recipients (not visible in email headers)
+            bcc_recipients = bcc if bcc else []
+
+            # Determine all recipients for sending
+            all_recipients = [recipient]
+            if bcc_recipients:
+                all_recipients.extend(bcc_recipients)
+
+            # Send the message
+            with self.tracer.span('smtp', recipients=len(all_recipients)):
+                self.session.sendmail(self.email, all_recipients, message)
+            logging.info(f"Email sent to {recipient} (with {len(bcc_recipients)} BCC recipients)")
+            return True
+        except Exception as e:
+            logging.error(f"Error sending email to {recipient}: {str(e)}")
+            # Try to reconnect in case of connection issues
+            self.connect()
+            return False
+
+    def _send_or_plan(self, planner: CampaignPlanner, recipient: str, subject: str, body_html: str,
+                      body_text: str = None, bcc: List[str] = None,
+                      list_unsubscribe: str = None, one_click: bool = False) -> bool:
+        """Send an email, or in a dry run (planner is set) only account for it"""
+        if planner is None:
+            return self.send_email(recipient, subject, body_html, body_text, bcc, list_unsubscribe, one_click)
+
+        planner.record(
+            lambda: self.build_message(recipient, subject, body_html, body_text, list_unsubscribe, one_click),
+            len(subject or '') + len(body_html or '') + len(body_text or ''),
+            [recipient] + (bcc or [])
+        )
+        return True
+
+    def send_rows(self, rows: List[Dict], html_template: str, text_template: str = None,
+                  subject_template: str = None, delay: int = 1, batch_size: int = 50,
+                  use_bcc: bool = True, check_unsubscribed: bool = True,
+                  render_cache: RenderCache = None, planner: CampaignPlanner = None,
+                  throttle: Callable[[int], None] = None, results: Dict[str, int] = None) -> Dict[str, int]:
+        """
+        Send emails to recipient rows that have already been read, deduplicated and validated.
+
+        Args:
+            rows: Recipient rows (dicts with an 'email' key and template fields)
+            html_template, text_template, subject_template, delay, batch_size, use_bcc,
+            check_unsubscribed: As for send_batch_from_csv
+            render_cache: Render cache to use in individual mode (optional, lets callers
+                          that send a list in several parts keep it warm)
+            planner: If given, transactions are recorded in it instead of sent (dry run)
+            throttle: Called with the number of recipients before each SMTP transaction;
+                      it may sleep to keep a shared rate budget (optional)
+            results: Dict the counts are added to as each email or batch completes, so they
+                     survive an exception part way through (optional, defaults to a new dict)
+
+        Returns:
+            Dict with count of successful, failed and skipped (unsubscribed) emails
+        """
+        if results is None:
+            results = {}
+        for key in ("success", "failed", "skipped"):
+            results.setdefault(key, 0)
+
+        if use_bcc:
+            # Group recipients into batches for BCC sending
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i+batch_size]
+                self.tracer.begin_batch(i // batch_size, len(batch))
+
+                # Skip empty batches
+                if not batch:
+                    continue
+
+                # Create list of recipient emails for this batch
+                batch_emails = []
+                for row in batch:
+                    if 'email' in row and row['email'].strip():
+                        batch_emails.append(row['email'].strip())
+
+                if not batch_emails:
+                    continue
+
+                # Filter out unsubscribed email addresses if requested
+                if check_unsubscribed:
+                    original_count = len(batch_emails)
+                    with self.tracer.span('suppression', recipients=original_count):
+                        batch_emails = self.filter_unsubscribed(batch_emails)
+                    skipped = original_count - len(batch_emails)
+                    results["skipped"] += skipped
+
+                    if not batch_emails:  # Skip if all recipients were unsubscribed
+                        logging.info(f"All recipients in batch were unsubscribed, skipping batch")
+                        continue
+
+                # Use the first row for template variables
+                # (since BCC recipients all get the same content)
+                template_row = batch[0]
+
+                # Process templates (no personalization in BCC mode)
+                with self.tracer.span('render'):
+                    email_html = html_template
+                    email_text = text_template
+                    email_subject = subject_template or "Important Information"
+
+                    # Replace only general placeholders, not recipient-specific ones
+                    for key, value in template_row.items():
+                        if key != 'email' and key != 'first_name' and key != 'last_name':
+                            if email_html:
+                                email_html = email_html.replace(f"{{{key}}}", value)
+                            if email_text:
+                                email_text = email_text.replace(f"{{{key}}}", value)
+                            if email_subject:
+                                email_subject = email_subject.replace(f"{{{key}}}", value)
+
+                    # Remove any remaining personalization placeholders
+                    if email_html:
+                        email_html = email_html.replace("{first_name}", "Valued Customer")
+                        email_html = email_html.replace("{last_name}", "")
+                        email_html = email_html.replace("{email}", "")
+                    if email_text:
+                        email_text = email_text.replace("{first_name}", "Valued Customer")
+                        email_text = email_text.replace("{last_name}", "")
+                        email_text = email_text.replace("{email}", "")
+
+                # Wait for the shared rate budget, if any
+                if throttle is not None:
+                    with self.tracer.span('throttle'):
+                        throttle(len(batch_emails))
+
+                # Send to yourself with all recipients in BCC
+                with self.tracer.span('send', recipients=len(batch_emails)):
+                    success = self._send_or_plan(
+                        planner,
+                        recipient=self.email,  # Send to yourself
+                        subject=email_subject,
+                        body_html=email_html,
+                        body_text=email_text,
+                        bcc=batch_emails  # All recipients in BCC
+                    )
+
+                if success:
+                    results["success"] += len(batch_emails)
+                else:
+                    results["failed"] += len(batch_emails)
+
+                # Add delay between batches
+                if delay > 0 and planner is None and i + batch_size < len(rows):
+                    with self.tracer.span('delay'):
+                        time.sleep(delay)
+        else:
+            # Individual email sending logic
+            if render_cache is None:
+                render_cache = RenderCache(
+                    html_template, text_template, subject_template or "Important Information"
+                )
+
+            # Sign every recipient's unsubscribe token up front (one bulk id lookup)
+            stage_start = time.perf_counter()
+            with self.tracer.span('tokens', recipients=len(rows)):
+                tokens = self.unsubscribe_tokens([row.get('email') or '' for row in rows])
+            if self.token_signer is not None:
+                logging.info(f"Signed {len(tokens)} unsubscribe tokens in {time.perf_counter() - stage_start:.3f}s")
+
+            # Look up every recipient's subscription status in one go
+            if check_unsubscribed:
+                stage_start = time.perf_counter()
+                with self.tracer.span('suppression', recipients=len(rows)):
+                    subscription_status = self.check_subscription_status(
+                        [row['email'].strip() for row in rows if row.get('email')]
+                    )
+                logging.info(f"Checked {len(subscription_status)} subscriptions in {time.perf_counter() - stage_start:.3f}s")
+
+            for index, row in enumerate(rows):
+                # Trace (and sample for profiling) in groups of batch_size emails
+                if index % batch_size == 0:
+                    self.tracer.begin_batch(index // batch_size, min(batch_size, len(rows) - index))
+
+                # Check if email address exists in the row
+                if 'email' not in row:
+                    logging.error(f"Missing email field in row: {row}")
+                    results["failed"] += 1
+                    continue
+
+                recipient = row['email'].strip()
+
+                # Check if recipient is unsubscribed
+                if check_unsubscribed:
+                    if not subscription_status.get(recipient, False):
+                        logging.info(f"Skipping unsubscribed recipient: {recipient}")
+                        results["skipped"] += 1
+                        continue
+
+                # Render templates: shared fields come from the cache, only the
+                # personal fields and the unsubscribe link are filled in per recipient
+                token = tokens.get(normalize_email(recipient))
+                with self.tracer.span('render'):
+                    personalized_html, personalized_text, email_subject = render_cache.render(
+                        row, unsubscribe_url(recipient, token)
+                    )
+
+                if throttle is not None:
+                    with self.tracer.span('throttle'):
+                        throttle(1)
+
+                # One-click unsubscribe needs a signed token; otherwise point at the page
+                with self.tracer.span('send', recipients=1):
+                    success = self._send_or_plan(
+                        planner,
+                        recipient=recipient,
+                        subject=email_subject,
+                        body_html=personalized_html,
+                        body_text=personalized_text,
+                        list_unsubscribe=one_click_unsubscribe_url(token) if token else unsubscribe_url(recipient),
+                        one_click=bool(token)
+                    )
+
+                if success:
+                    results["success"] += 1
+                else:
+                    results["failed"] += 1
+
+                # Add delay between emails
+                if delay > 0 and planner is None:
+                    with self.tracer.span('delay'):
+                        time.sleep(delay)
+
+            logging.info(f"Render cache: {render_cache.report()}")
+
+        self.tracer.end_batch()
+        return results
+
+    def send_batch_from_csv(self, csv_path: str, html_template: str,
+                           text_template: str = None, subject_template: str = None,
+                           delay: int = 1, batch_size: int = 50, use_bcc: bool = True,
+                           check_unsubscribed: bool = True, dedupe: bool = True,
+                           domain_rules: Dict[str, Dict] = None, validate: bool = True,
+                           check_mx: bool = False, quarantine_path: str = None,
+                           render_cache_size: int = DEFAULT_CACHE_SIZE, dry_run: bool = False,
+                           transaction_seconds: float = DEFAULT_TRANSACTION_SECONDS,
+                           trace_path: str = None, profile_fraction: float = 0.0) -> Dict[str, int]:
+        """
+        Send batch emails using data from a CSV file.
+
+        Args:
+            csv_path: Path to CSV file with recipient data (may be .gz or .zst compressed)
+            html_template: HTML email template with {placeholders}
+            text_template: Plain text template with {placeholders} (optional)
+            subject_template: Subject template with {placeholders} (optional)
+            delay: Delay between emails in seconds (to avoid rate limits)
+            batch_size: Number of recipients to include in each BCC batch (when use_bcc=True)
+            use_bcc: If True, sends emails in batches using BCC (ideal for marketing emails)
+            check_unsubscribed: If True, checks subscription database and skips unsubscribed emails
+            dedupe: If True, drops rows whose address already appeared earlier in the CSV
+            domain_rules: Per-domain dedup rules (defaults to DEFAULT_DOMAIN_RULES: Gmail
+                          ignores dots and +tags)
+            validate: If True, drops rows with malformed addresses before sending
+            check_mx: If True (and validate is on), also drops domains without mail servers
+            quarantine_path: Optional CSV file that receives the rows dropped by validation
+            render_cache_size: Number of pre-rendered template variants kept in individual mode
+                               (one per distinct combination of non-personal fields)
+            dry_run: If True, runs everything except the SMTP connection and reports what the
+                     send would cost instead (nothing is sent, "success" counts would-be recipients)
+            transaction_seconds: Estimated time per SMTP transaction, used by dry_run
+            trace_path: If given, time every stage (CSV read, suppression lookup, render, MIME
+                        build, SMTP transaction, delay) and write a Chrome trace file there
+            profile_fraction: With trace_path, fraction of batches to run under cProfile
+                              (the stats are written next to the trace, with a .prof suffix)
+
+        Returns:
+            Dict with count of successful, failed, skipped (unsubscribed), duplicate and invalid emails.
+            A dry run adds transactions, recipients, bytes, message_bytes and estimated_seconds.
+        """
+        results = {"success": 0, "failed": 0, "skipped": 0, "duplicates": 0, "invalid": 0}
+
+        if trace_path:
+            self.tracer = Tracer(trace_path, profile_fraction)
+
+        # A dry run records each SMTP transaction in the planner instead of sending it
+        planner = None
+        if dry_run:
+            planner = CampaignPlanner(self.email, delay, delay_after_last=not use_bcc,
+                                      transaction_seconds=transaction_seconds)
+        else:
+            with self.tracer.span('connect'):
+                connected = self.connect()
+            if not connected:
+                self.tracer.close()
+                self.tracer = NULL_TRACER
+                return results
+
+        try:
+            # Compiled recipient files are read through mmap without CSV parsing
+            stage_start = time.perf_counter()
+            with self.tracer.span('read'):
+                _, all_rows = load_rows(csv_path)
+            logging.info(f"Read {len(all_rows)} rows in {time.perf_counter() - stage_start:.3f}s")
+
+            # Drop repeated addresses so nobody receives the campaign twice
+            if dedupe:
+                stage_start = time.perf_counter()
+                with self.tracer.span('dedupe'), Deduplicator(domain_rules) as deduplicator:
+                    all_rows = list(deduplicator.filter_rows(all_rows))
+                results["duplicates"] = deduplicator.duplicates
+                logging.info(f"Removed {deduplicator.duplicates} duplicate recipients "
+                             f"({deduplicator.stats['exact_duplicates']} exact, "
+                             f"{deduplicator.stats['rule_duplicates']} by domain rules) "
+                             f"in {time.perf_counter() - stage_start:.3f}s")
+
+            # Drop malformed addresses before they cost an SMTP round trip
+            # (in BCC mode one bad address can fail the whole batch)
+            if validate:
+                with self.tracer.span('validate'), \
+                        AddressValidator(check_mx=check_mx, quarantine_path=quarantine_path) as validator:
+                    all_rows = list(validator.filter_rows(all_rows))
+                results["invalid"] = validator.stats['invalid']
+                logging.info(f"Address validation: {validator.report()}")
+
+            # Counts go straight into results, so an error part way keeps what was already sent
+            self.send_rows(
+                all_rows, html_template, text_template, subject_template,
+                delay=delay, batch_size=batch_size, use_bcc=use_bcc,
+                check_unsubscribed=check_unsubscribed,
+                render_cache=RenderCache(
+                    html_template, text_template, subject_template or "Important Information",
+                    maxsize=render_cache_size
+                ),
+                planner=planner,
+                results=results
+            )
+
+            if planner is not None:
+                results.update(planner.as_dict())
+                logging.info(f"Dry run: {planner.report()}")
+
+        except Exception as e:
+            logging.error(f"Batch processing error: {str(e)}")
+
+        finally:
+            self.disconnect()
+            self.tracer.close()
+            self.tracer = NULL_TRACER
+
+        return results
+
+
+def print_results(results: Dict[str, int]):
+    """Print the outcome of send_batch_from_csv"""
+    if 'transactions' in results:
+        print(f"Dry run: {results['transactions']} SMTP transactions to {results['recipients']} recipients, "
+              f"{results['bytes'] / 1e6:.1f} MB, estimated {results['estimated_seconds']:.0f} seconds")
+    print(f"Batch email results: {results['success']} successful, {results['failed']} failed, "
+          f"{results['skipped']} skipped (unsubscribed), {results['duplicates']} duplicates removed, "
+          f"{results['invalid']} invalid")
+
+
+def main(argv: List[str] = None):
+    """
+    Send a campaign from the command line.
+
+    SMTP settings come from the environment: SMTP_SERVER, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD.
+    """
+    parser = argparse.ArgumentParser(prog='batch-email send', description='Send a campaign to a recipient list')
+    parser.add_argument('--csv', required=True, help='Recipient CSV (plain, .gz, .zst) or compiled recipient file')
+    parser.add_argument('--html', required=True, help='HTML template file')
+    parser.add_argument('--text', help='Plain text template file')
+    parser.add_argument('--subject', help='Subject template')
+    parser.add_argument('--individual', action='store_true', help='One email per recipient instead of BCC batches')
+    parser.add_argument('--batch-size', type=int, default=50, help='Recipients per BCC batch (default: 50)')
+    parser.add_argument('--delay', type=float, default=1, help='Seconds between emails or batches (default: 1)')
+    parser.add_argument('--no-check-unsubscribed', action='store_true', help='Send to unsubscribed addresses too')
+    parser.add_argument('--no-dedupe', action='store_true', help='Keep repeated addresses')
+    parser.add_argument('--no-validate', action='store_true', help="Don't drop malformed addresses")
+    parser.add_argument('--check-mx', action='store_true', help='Also drop domains without mail servers')
+    parser.add_argument('--quarantine', help='CSV file that receives the rows dropped by validation')
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Don't connect or send; report SMTP transactions, bytes and estimated duration")
+    parser.add_argument('--transaction-seconds', type=float, default=DEFAULT_TRANSACTION_SECONDS,
+                        help=f'With --dry-run, estimated time per SMTP transaction (default: {DEFAULT_TRANSACTION_SECONDS})')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write a Chrome trace of every pipeline stage to FILE')
+    parser.add_argument('--profile-fraction', type=float, default=0.0,
+                        help='With --trace, fraction of batches to run under cProfile (e.g. 0.05)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, filename='email_log.txt')
+
+    sender = BatchEmailSender(
+        os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        int(os.environ.get('SMTP_PORT', 587)),
+        os.environ.get('SMTP_EMAIL', ''),
+        os.environ.get('SMTP_PASSWORD', '')
+    )
+    results = sender.send_batch_from_csv(
+        csv_path=args.csv,
+        html_template=read_template(args.html),
+        text_template=read_template(args.text),
+        subject_template=args.subject,
+        delay=args.delay,
+        batch_size=args.batch_size,
+        use_bcc=not args.individual,
+        check_unsubscribed=not args.no_check_unsubscribed,
+        dedupe=not args.no_dedupe,
+        validate=not args.no_validate,
+        check_mx=args.check_mx,
+        quarantine_path=args.quarantine,
+        dry_run=args.dry_run,
+        transaction_seconds=args.transaction_seconds,
+        trace_path=args.trace,
+        profile_fraction=args.profile_fraction
+    )
+    print_results(results)
@@ -0,0 +1,73 @@
+"""
+Production serving for the unsubscribe Flask app.
+
+Uses gunicorn (pre-fork workers with threads, graceful reload on SIGHUP) when
+it is installed, and falls back to waitress (single process, multi-threaded)
+on platforms where gunicorn isn't available, such as Windows.
+"""
+
+import logging
+import os
+
+
+def default_workers() -> int:
+    """Default number of worker processes: 2 x CPU cores + 1"""
+    return (os.cpu_count() or 1) * 2 + 1
+
+
+def run_production(app, host: str = '0.0.0.0', port: int = 5000,
+                   workers: int = None, threads: int = 4, timeout: int = 30,
+                   on_starting=None, on_worker_start=None):
+    """
+    Serve a WSGI app with a production server.
+
+    Args:
+        app: WSGI application to serve
+        host: Interface to bind to
+        port: Port to bind to
+        workers: Number of worker processes (gunicorn only, default 2 x CPU + 1)
+        threads: Number of threads per worker
+        timeout: Seconds before an unresponsive worker is restarted (gunicorn only)
+        on_starting: Optional callable run once in the master before workers start
+        on_worker_start: Optional callable run in each worker once it has started
+    """
+    workers = workers or default_workers()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class StandaloneApplication(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f"{host}:{port}")
+                self.cfg.set('workers', workers)
+                self.cfg.set('threads', threads)
+                self.cfg.set('timeout', timeout)
+                self.cfg.set('graceful_timeout', timeout)
+                if on_starting:
+                    self.cfg.set('on_starting', lambda server: on_starting())
+                if on_worker_start:
+                    self.cfg.set('post_worker_init', lambda worker: on_worker_start())
+
+            def load(self):
+                return app
+
+        logging.info(f"Starting gunicorn on {host}:{port} with {workers} workers x {threads} threads")
+        StandaloneApplication().run()
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        raise RuntimeError(
+            "No production server installed. Install one with: pip install gunicorn  (or: pip install waitress)"
+        )
+
+    if on_starting:
+        on_starting()
+    if on_worker_start:
+        on_worker_start()
+    logging.info(f"Starting waitress on {host}:{port} with {threads} threads")
+    serve(app, host=host, port=port, threads=threads)
@@ -0,0 +1,413 @@
+"""
+Synchronizes your marketing CSV with the subscribers database
+to ensure you're only emailing people who haven't unsubscribed.
+"""
+
+import argparse
+import csv
+import os
+import shutil
+from datetime import datetime
+from itertools import repeat
+from typing import List
+
+from batch_email.compression import detect_compression, open_text
+from batch_email.dedup import EXACT_RULES, Deduplicator
+from batch_email.emails import email_hash, normalize_email
+from batch_email.incremental import CLOCK_SKEW_MARGIN, SyncState, copy_prefix, fingerprint, format_record, \
+    read_records, rewrite_record, row_positions
+from batch_email.migrations import DEFAULT_DB_PATH, analyze
+from batch_email.recipient_file import RecipientFile, compile_recipients, is_recipient_file, load_rows
+from batch_email.store import SQLiteStore, open_store
+
+
+def import_from_csv(csv_path, store=None, dedupe=True):
+    """Import subscribers from CSV into database"""
+    if not os.path.exists(csv_path):
+        print(f"Error: File {csv_path} not found")
+        return 0
+
+    store = store or open_store()
+
+    if is_recipient_file(csv_path):
+        # Read just the three columns straight from the mapped file
+        with RecipientFile(csv_path) as recipients, Deduplicator(EXACT_RULES) as deduplicator:
+            emails = recipients.column('email') if 'email' in recipients.columns else iter(())
+            rows = zip(emails, *(recipients.column(name) if name in recipients.columns else repeat('')
+                                 for name in ('first_name', 'last_name')))
+            if dedupe:
+                rows = (row for row in rows if deduplicator.is_new(row[0]))
+            count = store.upsert_subscribers(rows)
+    else:
+        with open_text(csv_path) as file, Deduplicator(EXACT_RULES) as deduplicator:
+            rows = csv.DictReader(file)
+            if dedupe:
+                rows = deduplicator.filter_rows(rows)
+
+            # Existing records are left untouched to preserve their subscription status
+            count = store.upsert_subscribers(
+                (row.get('email') or '', row.get('first_name') or '', row.get('last_name') or '')
+                for row in rows
+            )
+
+    if deduplicator.duplicates:
+        print(f"Skipped {deduplicator.duplicates} duplicate rows in {csv_path}")
+    return count
+
+
+def filter_unsubscribed(input_csv, output_csv, store=None, dedupe=True):
+    """
+    Create a new CSV with only subscribed emails (and, with dedupe, each address once)
+    """
+    if not os.path.exists(input_csv):
+        print(f"Error: File {input_csv} not found")
+        return 0
+
+    store = store or open_store()
+
+    # Read all rows from the input CSV (or compiled recipient file)
+    headers, rows = load_rows(input_csv)
+
+    if dedupe:
+        with Deduplicator() as deduplicator:
+            rows = list(deduplicator.filter_rows(rows))
+        if deduplicator.duplicates:
+            print(f"Removed {deduplicator.duplicates} duplicate rows from {input_csv}")
+
+    # Look up every address in one bulk query
+    status = store.lookup(row.get('email') or '' for row in rows)
+
+    # Create output CSV with the same headers (compressed if its name ends in .gz or .zst)
+    with open_text(output_csv, 'w') as file:
+        writer = csv.DictWriter(file, fieldnames=headers)
+        writer.writeheader()
+
+        # Filter rows based on subscription status
+        filtered_count = 0
+        for row in rows:
+            if 'email' not in row:
+                continue
+
+            email = normalize_email(row.get('email', ''))
+            if not email:
+                continue
+
+            # Include row if subscribed or not found in database (default to include)
+            if status.get(email, True):
+                writer.writerow(row)
+            else:
+                filtered_count += 1
+
+    return filtered_count
+
+
+def update_original_csv(csv_path, store=None):
+    """
+    Update the original CSV file to reflect current subscription status.
+    This modifies the original CSV file directly, adding a 'subscribed' column.
+
+    Args:
+        csv_path: Path to the original CSV file
+        store: Subscriber store (defaults to open_store())
+
+    Returns:
+        int: Number of unsubscribed users marked in the file
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: File {csv_path} not found")
+        return 0
+
+    store = store or open_store()
+
+    # Compiled recipient files are updated in place: only the subscribed bitmap changes
+    if is_recipient_file(csv_path):
+        with RecipientFile(csv_path, writable=True) as recipients:
+            unsubscribed_count, new_subscribers = recipients.refresh_subscribed(store)
+        store.upsert_subscribers(new_subscribers)
+        print(f"Updated {csv_path} with current subscription status")
+        return unsubscribed_count
+
+    # Create a backup of the original file
+    backup_path = f"{csv_path}.backup"
+    shutil.copyfile(csv_path, backup_path)
+
+    # Read all rows from the input CSV, remembering its compression to write it back the same way
+    compression = detect_compression(csv_path)
+    with open_text(csv_path, compression=compression) as file:
+        reader = csv.DictReader(file)
+        headers = reader.fieldnames
+        rows = list(reader)
+
+    # Add 'subscribed' to headers if it doesn't exist
+    if 'subscribed' not in headers:
+        headers.append('subscribed')
+
+    # Look up every address in one bulk query
+    status = store.lookup(row.get('email') or '' for row in rows)
+    new_subscribers = []
+
+    # Update rows with subscription status
+    unsubscribed_count = 0
+    for row in rows:
+        if 'email' not in row:
+            row['subscribed'] = "1"  # Default to subscribed if no email
+            continue
+
+        email = normalize_email(row.get('email', ''))
+        if not email:
+            row['subscribed'] = "1"  # Default to subscribed if empty email
+            continue
+
+        if email not in status:
+            # Email not in database, add it as subscribed
+            new_subscribers.append((email, row.get('first_name', ''), row.get('last_name', '')))
+            status[email] = True
+            row['subscribed'] = "1"
+        else:
+            # Update row with current subscription status
+            row['subscribed'] = "1" if status[email] else "0"
+            if not status[email]:
+                unsubscribed_count += 1
+
+    # Write updated data back to the original file
+    with open_text(csv_path, 'w', compression=compression) as file:
+        writer = csv.DictWriter(file, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    store.upsert_subscribers(new_subscribers)
+
+    print(f"Updated {csv_path} with current subscription status")
+    print(f"A backup of the original file was created at {backup_path}")
+
+    return unsubscribed_count
+
+
+def compile_csv(csv_path, output_path, store=None):
+    """
+    Compile a CSV into a recipient file that later runs read without parsing CSV.
+
+    Args:
+        csv_path: Path to the CSV file
+        output_path: Path of the compiled file (e.g. recipients.brf)
+        store: Subscriber store to take subscription statuses from (optional, defaults to
+               the CSV's 'subscribed' column)
+
+    Returns:
+        int: Number of rows compiled
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: File {csv_path} not found")
+        return 0
+
+    with open_text(csv_path) as file:
+        reader = csv.DictReader(file)
+        return compile_recipients(reader, reader.fieldnames or [], output_path, store)
+
+
+def full_sync(csv_path, store, state=None, dedupe=True):
+    """
+    Import every row of a CSV, rewrite it with current statuses and (with state) index its rows.
+    """
+    started = datetime.now()
+
+    count = import_from_csv(csv_path, store, dedupe)
+    print(f"Imported {count} new subscribers to database")
+
+    unsubscribed = update_original_csv(csv_path, store)
+    print(f"Updated CSV file, marked {unsubscribed} emails as unsubscribed")
+
+    if state is None:
+        return
+
+    # Remember where every row is, so the next sync only handles what changed
+    with open(csv_path, 'rb') as file:
+        records = read_records(file)
+        _, columns = next(records, (0, []))
+        if 'email' in columns:
+            state.record(csv_path, columns, started, row_positions(records, columns.index('email')), replace=True)
+
+
+def sync_csv(csv_path, store, dedupe=True, full=False):
+    """
+    Import new subscribers from a CSV and update its subscription statuses.
+
+    After the first (full) sync, only rows appended to the file and subscribers whose
+    status changed since the previous sync are processed. The file is rescanned in full
+    if it was changed in any other way, or if it is compressed or a compiled recipient file.
+
+    Args:
+        csv_path: Path to the CSV file
+        store: Subscriber store
+        dedupe: Skip repeated addresses when importing
+        full: Rescan the whole file even if an incremental sync is possible
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: File {csv_path} not found")
+        return
+
+    # Compressed and compiled files can't be patched in place
+    if is_recipient_file(csv_path) or detect_compression(csv_path):
+        full_sync(csv_path, store, None, dedupe)
+        return
+
+    state = SyncState(store.db_path if isinstance(store, SQLiteStore) else DEFAULT_DB_PATH)
+    previous = None if full else state.get(csv_path)
+    if previous is None or 'email' not in previous['columns'] or 'subscribed' not in previous['columns']:
+        full_sync(csv_path, store, state, dedupe)
+        return
+
+    # Anything but appended rows invalidates the recorded row positions
+    if (os.path.getsize(csv_path) < previous['size']
+            or fingerprint(csv_path, previous['size']) != previous['fingerprint']):
+        print(f"{csv_path} was edited since the last sync, rescanning it")
+        full_sync(csv_path, store, state, dedupe)
+        return
+
+    started = datetime.now()
+    columns = previous['columns']
+    email_index = columns.index('email')
+    subscribed_index = columns.index('subscribed')
+    name_indexes = [columns.index(name) if name in columns else None for name in ('first_name', 'last_name')]
+
+    # Rows appended since the last sync: import them and rewrite them with their status
+    with open(csv_path, 'rb') as file:
+        appended = [fields + [''] * (len(columns) - len(fields))
+                    for _, fields in read_records(file, previous['size'])]
+    with Deduplicator(EXACT_RULES) as deduplicator:
+        imported = store.upsert_subscribers(
+            (fields[email_index], *(fields[index] if index is not None else '' for index in name_indexes))
+            for fields in appended if not dedupe or deduplicator.is_new(fields[email_index])
+        )
+    status = store.lookup(fields[email_index] for fields in appended)
+
+    # Appended rows change length, so they are written to a copy that replaces the file
+    # once complete; status flips are the same length and can be written in place
+    target = copy_prefix(csv_path, previous['size']) if appended else csv_path
+    try:
+        with open(target, 'r+b') as file:
+            unsubscribed = 0
+            new_positions = []
+            position = previous['size']
+            file.seek(position)
+            for fields in appended:
+                email = normalize_email(fields[email_index])
+                fields[subscribed_index] = "0" if status.get(email) is False else "1"
+                unsubscribed += fields[subscribed_index] == "0"
+                record = format_record(fields)
+                file.write(record)
+                if email:
+                    new_positions.append((email_hash(email), position))
+                position += len(record)
+
+            # Subscribers changed since the last sync: flip their rows in place. Subscribers
+            # only added since (by the imports of the last sync or this one) are skipped:
+            # their rows were written with the status they still have.
+            changes = store.changed_since(previous['high_water'] - CLOCK_SKEW_MARGIN, include_new=False)
+            flipped = 0
+            stale = False
+            for email, positions in state.positions(previous['id'], changes).items():
+                value = "1" if changes[email] else "0"
+                for row_position in positions:
+                    try:
+                        _, fields = next(read_records(file, row_position), (None, None))
+                    except (csv.Error, UnicodeDecodeError):
+                        fields = None
+                    if fields is None or len(fields) <= max(email_index, subscribed_index) \
+                            or normalize_email(fields[email_index]) != email:
+                        stale = True
+                        break
+                    if fields[subscribed_index] == value:
+                        continue
+                    updated = list(fields)
+                    updated[subscribed_index] = value
+                    if not rewrite_record(file, row_position, fields, updated):
+                        stale = True
+                        break
+                    flipped += 1
+                    unsubscribed += value == "0"
+                if stale:
+                    break
+
+            if target != csv_path and not stale:
+                file.flush()
+                os.fsync(file.fileno())
+
+        if target != csv_path and not stale:
+            os.replace(target, csv_path)
+    finally:
+        if target != csv_path and os.path.exists(target):
+            os.remove(target)
+
+    if stale:
+        print(f"{csv_path} was edited since the last sync, rescanning it")
+        full_sync(csv_path, store, state, dedupe)
+        return
+
+    state.record(csv_path, columns, started, new_positions, replace=False)
+    print(f"Imported {imported} new subscribers from {len(appended)} appended rows")
+    print(f"Updated {flipped} changed rows in {csv_path}, {unsubscribed} marked as unsubscribed")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog='batch-email sync', description='Manage email subscribers')
+    parser.add_argument('--import', dest='import_csv', help='Import subscribers from CSV file')
+    parser.add_argument('--filter', dest='filter', nargs=2, metavar=('INPUT_CSV', 'OUTPUT_CSV'),
+                        help='Filter out unsubscribed emails from CSV file')
+    parser.add_argument('--update', dest='update_csv', help='Update the original CSV with subscription status')
+    parser.add_argument('--sync-all', dest='sync_all', nargs='?', const='examples/recipients.csv', metavar='CSV',
+                        help='Sync database and update the CSV in one operation, processing only changes '
+                             'since the last sync (default CSV: examples/recipients.csv)')
+    parser.add_argument('--full', dest='full', action='store_true',
+                        help='With --sync-all, rescan the whole file instead of only the changes')
+    parser.add_argument('--compile', dest='compile', nargs=2, metavar=('INPUT_CSV', 'OUTPUT_FILE'),
+                        help='Compile a CSV into a binary recipient file (read via mmap by every command)')
+    parser.add_argument('--status-from-store', dest='status_from_store', action='store_true',
+                        help='With --compile, record subscription status from the store instead of the CSV')
+    parser.add_argument('--analyze', dest='analyze', action='store_true',
+                        help='Refresh query planner statistics (safe while the unsubscribe service is running)')
+    parser.add_argument('--no-dedupe', dest='dedupe', action='store_false',
+                        help='Keep duplicate addresses when importing or filtering')
+    parser.add_argument('--store', dest='store', default=None,
+                        help='Subscriber store URL, e.g. sqlite:///email_subscribers.db or postgresql://host/db '
+                             '(default: $SUBSCRIBER_STORE or the local SQLite database)')
+
+    args = parser.parse_args(argv)
+
+    # Open the store (creates the database or applies pending schema migrations)
+    store = open_store(args.store)
+
+    if args.import_csv:
+        count = import_from_csv(args.import_csv, store, args.dedupe)
+        print(f"Imported {count} new subscribers to database")
+
+    if args.filter:
+        input_csv, output_csv = args.filter
+        filtered = filter_unsubscribed(input_csv, output_csv, store, args.dedupe)
+        print(f"Created filtered CSV at {output_csv}, removed {filtered} unsubscribed emails")
+
+    if args.update_csv:
+        unsubscribed = update_original_csv(args.update_csv, store)
+        print(f"Updated CSV file, marked {unsubscribed} emails as unsubscribed")
+
+    if args.sync_all:
+        if os.path.exists(args.sync_all):
+            # Import new subscribers, then update the CSV with current subscription status
+            sync_csv(args.sync_all, store, args.dedupe, args.full)
+        else:
+            print(f"Error: CSV file {args.sync_all} not found")
+            print(f"Please use --sync-all <csv_path> to specify a different file.")
+
+    if args.compile:
+        input_csv, output_file = args.compile
+        count = compile_csv(input_csv, output_file, store if args.status_from_store else None)
+        print(f"Compiled {count} rows from {input_csv} into {output_file}")
+
+    if args.analyze:
+        if isinstance(store, SQLiteStore):
+            analyze(store.db_path)
+            print("Refreshed database statistics")
+        else:
+            print("--analyze only applies to the SQLite store")
+
+    store.close()
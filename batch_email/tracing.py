@@ -0,0 +1,171 @@
+"""
+Opt-in per-stage tracing of a send.
+
+The sender wraps each pipeline stage (reading the CSV, suppression lookups,
+rendering, building MIME messages, SMTP transactions, delays) in
+tracer.span(name). With the default NULL_TRACER a span is a shared no-op
+context manager, so the instrumentation can stay in production code. A Tracer
+records every span and writes them as a Chrome trace file (open it in
+chrome://tracing, https://ui.perfetto.dev or speedscope for a flame graph).
+
+A Tracer can also run cProfile for a fraction of the batches, spread evenly
+over the send; the profile of all sampled batches is written next to the
+trace (inspect it with python -m pstats, snakeviz or flameprof).
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer._record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+class _NullTracer:
+    """Tracer that records nothing (the default)"""
+    enabled = False
+    _span = contextlib.nullcontext()
+
+    def span(self, name: str, **args):
+        return self._span
+
+    def begin_batch(self, number: int, recipients: int = 0):
+        pass
+
+    def end_batch(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_TRACER = _NullTracer()
+
+
+class Tracer:
+    enabled = True
+
+    def __init__(self, path: str, profile_fraction: float = 0.0, profile_path: str = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            path: Chrome trace file written by close()
+            profile_fraction: Fraction of batches to run under cProfile (0 to 1)
+            profile_path: File for the cProfile stats (default: path with a .prof suffix)
+        """
+        if not 0 <= profile_fraction <= 1:
+            raise ValueError("profile_fraction must be between 0 and 1")
+        self.path = path
+        self.profile_fraction = profile_fraction
+        self.profile_path = profile_path or f"{os.path.splitext(path)[0]}.prof"
+        self.events = []
+        self.profiled_batches = 0
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._profiler = None
+        if profile_fraction:
+            # Imported here so sends that don't profile (and untraced ones) don't pay for it
+            import cProfile
+            self._profiler = cProfile.Profile()
+        self._batch = None
+        self._closed = False
+
+    def span(self, name: str, **args) -> _Span:
+        """Return a context manager that records the time spent in it as a span"""
+        return _Span(self, name, args)
+
+    def _record(self, name: str, start: int, end: int, args: Dict):
+        # list.append is atomic, so spans may be recorded from several threads
+        self.events.append((name, start, end, threading.get_ident(), args))
+
+    def _sampled(self, number: int) -> bool:
+        """Pick batches evenly: batch n is sampled when the running count of samples steps up"""
+        return int((number + 1) * self.profile_fraction) > int(number * self.profile_fraction)
+
+    def begin_batch(self, number: int, recipients: int = 0):
+        """
+        Start a batch span (ending the previous one), profiling it if it is sampled.
+
+        Args:
+            number: Index of the batch in the send
+            recipients: Number of recipients in the batch
+        """
+        self.end_batch()
+        profiled = self._profiler is not None and self._sampled(number)
+        if profiled:
+            try:
+                self._profiler.enable()
+                self.profiled_batches += 1
+            except ValueError as e:
+                # Another profiler (or debugger) is active in this process
+                logging.warning(f"Batch profiling disabled: {str(e)}")
+                self._profiler = None
+                profiled = False
+        self._batch = (number, recipients, profiled, time.perf_counter_ns())
+
+    def end_batch(self):
+        """End the current batch span, if any"""
+        if self._batch is None:
+            return
+        number, recipients, profiled, start = self._batch
+        self._batch = None
+        if profiled:
+            self._profiler.disable()
+        self._record('batch', start, time.perf_counter_ns(),
+                     {'batch': number, 'recipients': recipients, 'profiled': profiled})
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Return the number of spans and total seconds per stage"""
+        totals = {}
+        for name, start, end, _, _ in self.events:
+            stage = totals.setdefault(name, {'count': 0, 'seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += (end - start) / 1e9
+        return totals
+
+    def report(self) -> str:
+        """One-line summary of the time spent per stage"""
+        return ", ".join(f"{name} {stage['seconds']:.3f}s/{stage['count']}"
+                         for name, stage in sorted(self.totals().items(), key=lambda item: -item[1]['seconds']))
+
+    def trace_events(self) -> List[Dict]:
+        """Return the spans as Chrome trace 'complete' events (times in microseconds)"""
+        return [
+            {'name': name, 'cat': 'send', 'ph': 'X', 'pid': self._pid, 'tid': thread,
+             'ts': (start - self._origin) / 1000, 'dur': (end - start) / 1000, 'args': args}
+            for name, start, end, thread, args in self.events
+        ]
+
+    def close(self):
+        """End the current batch and write the trace (and the profile, if any batch was sampled)"""
+        if self._closed:
+            return
+        self._closed = True
+        self.end_batch()
+
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, file)
+        logging.info(f"Wrote trace of {len(self.events)} spans to {self.path}: {self.report()}")
+
+        if self._profiler is not None and self.profiled_batches:
+            self._profiler.dump_stats(self.profile_path)
+            logging.info(f"Wrote profile of {self.profiled_batches} batches to {self.profile_path}")
@@ -0,0 +1,110 @@
+"""
+Batched writes for one-click unsubscribes.
+
+Mailbox providers send RFC 8058 one-click unsubscribes as plain POST requests,
+often in bursts right after a campaign goes out. The web handler only verifies
+the token and queues the subscriber id; a background thread writes the queued
+ids to the store in one statement every flush interval.
+
+Queued ids that haven't been flushed when the process is killed are lost, so
+keep the flush interval short. close() (also registered with atexit) writes
+whatever is left on a normal shutdown.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from typing import List
+
+from batch_email.store import SubscriberStore
+
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_BATCH = 1000
+
+
+class UnsubscribeQueue:
+    def __init__(self, store: SubscriberStore, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH, reason: str = 'one-click'):
+        """
+        Initialize the queue.
+
+        Args:
+            store: Subscriber store the unsubscribes are written to
+            flush_interval: Seconds between writes
+            max_batch: Queued ids that trigger a write before the interval is up
+            reason: Reason recorded in unsubscribe_reasons
+        """
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.reason = reason
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self.flushed = 0
+        atexit.register(self.close)
+
+    def add(self, subscriber_id: int):
+        """Queue a subscriber to be unsubscribed"""
+        with self._lock:
+            self._pending.append(subscriber_id)
+            pending = len(self._pending)
+        self._ensure_worker()
+        if pending >= self.max_batch:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        """Start the flush thread (again after a fork, since threads don't survive it)"""
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name='unsubscribe-queue', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Write queued ids every flush interval"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _take(self) -> List[int]:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def flush(self) -> int:
+        """
+        Write all queued unsubscribes now.
+
+        Returns:
+            int: Number of subscribers whose status changed
+        """
+        pending = self._take()
+        if not pending:
+            return 0
+        try:
+            changed = self.store.unsubscribe_ids(pending, self.reason)
+        except Exception as e:
+            logging.error(f"Error writing {len(pending)} one-click unsubscribes: {str(e)}")
+            # Put them back so the next flush retries
+            with self._lock:
+                self._pending[:0] = pending
+            return 0
+        self.flushed += len(pending)
+        logging.info(f"One-click unsubscribe: wrote {len(pending)} requests ({changed} subscribers changed)")
+        return changed
+
+    def close(self):
+        """Stop the flush thread and write whatever is still queued"""
+        self._closed = True
+        self._wakeup.set()
+        if self._worker is not None and self._pid == os.getpid() and self._worker is not threading.current_thread():
+            self._worker.join(timeout=5)
+        self.flush()
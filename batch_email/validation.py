@@ -0,0 +1,215 @@
+"""
+Cheap address validation before anything reaches the SMTP server.
+
+Addresses are checked in chunks: the local part with a precompiled pattern,
+the domain once per distinct domain (syntax and, optionally, whether it has MX
+records). Domain verdicts are cached, so a million-row list with a few
+thousand domains does only a few thousand domain checks.
+
+Rejected rows can be written to a quarantine CSV for review.
+"""
+
+import csv
+import logging
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Unquoted local part: atoms separated by single dots (RFC 5322 dot-atom)
+LOCAL_PART = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
+# Hostname labels of letters, digits and inner hyphens, with an alphabetic or
+# punycode (xn--) TLD. Internationalized domains are matched in their ASCII form.
+DOMAIN = re.compile(r"(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+(?:[A-Za-z]{2,63}|xn--[A-Za-z0-9-]{1,59})")
+
+MAX_ADDRESS_LENGTH = 254
+MAX_LOCAL_LENGTH = 64
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def dns_mx_resolver(domain: str) -> bool:
+    """
+    Check whether a domain can receive mail (has MX records, or at least an A record).
+
+    Uses dnspython when installed and falls back to an address lookup otherwise.
+    """
+    try:
+        import dns.resolver
+    except ImportError:
+        import socket
+        try:
+            socket.getaddrinfo(domain, 25)
+            return True
+        except socket.gaierror:
+            return False
+
+    try:
+        dns.resolver.resolve(domain, 'MX')
+        return True
+    except (dns.resolver.NoAnswer, dns.resolver.NoNameservers):
+        # No MX: mail falls back to the A record
+        try:
+            dns.resolver.resolve(domain, 'A')
+            return True
+        except Exception:
+            return False
+    except Exception:
+        return False
+
+
+class AddressValidator:
+    def __init__(self, check_mx: bool = False, resolver: Callable[[str], bool] = None,
+                 quarantine_path: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize the validator.
+
+        Args:
+            check_mx: If True, also reject domains that can't receive mail
+            resolver: Callable taking a domain and returning True if it accepts mail
+                      (defaults to dns_mx_resolver; replace it in tests)
+            quarantine_path: Optional CSV file where rejected rows are written with a reason
+            chunk_size: Number of rows validated at a time
+        """
+        self.check_mx = check_mx
+        self.resolver = resolver or dns_mx_resolver
+        self.quarantine_path = quarantine_path
+        self.chunk_size = chunk_size
+        self._domain_cache = {}
+        self._quarantine_file = None
+        self._quarantine_writer = None
+        self.stats = {
+            'valid': 0,
+            'invalid': 0,
+            'reasons': {},
+            'domains_checked': 0,
+            'domain_cache_hits': 0,
+            'timings': {'syntax': 0.0, 'domain': 0.0, 'quarantine': 0.0},
+        }
+
+    def _check_domain(self, domain: str) -> Optional[str]:
+        """Return the rejection reason for a domain, or None if it's acceptable (cached)"""
+        if domain in self._domain_cache:
+            self.stats['domain_cache_hits'] += 1
+            return self._domain_cache[domain]
+
+        self.stats['domains_checked'] += 1
+        ascii_domain = domain
+        if not domain.isascii():
+            # Unicode domains (bücher.de) are checked as punycode (xn--bcher-kva.de)
+            try:
+                ascii_domain = domain.encode('idna').decode('ascii')
+            except UnicodeError:
+                ascii_domain = ''
+
+        if not DOMAIN.fullmatch(ascii_domain) or len(ascii_domain) > 253:
+            verdict = 'invalid_domain'
+        elif self.check_mx and not self.resolver(ascii_domain):
+            verdict = 'no_mx'
+        else:
+            verdict = None
+        self._domain_cache[domain] = verdict
+        return verdict
+
+    def validate(self, emails: List[str]) -> List[Optional[str]]:
+        """
+        Validate a chunk of addresses.
+
+        Args:
+            emails: Email addresses
+
+        Returns:
+            List with None for each valid address and a rejection reason otherwise
+        """
+        start = time.perf_counter()
+        fullmatch = LOCAL_PART.fullmatch
+        verdicts = []
+        pending_domains = []
+        for index, email in enumerate(emails):
+            email = (email or '').strip()
+            local, at, domain = email.rpartition('@')
+            if not email:
+                verdicts.append('empty')
+            elif not at or not local or len(email) > MAX_ADDRESS_LENGTH or len(local) > MAX_LOCAL_LENGTH:
+                verdicts.append('invalid_syntax')
+            elif not fullmatch(local):
+                verdicts.append('invalid_syntax')
+            else:
+                verdicts.append(None)
+                pending_domains.append((index, domain.lower()))
+        syntax_done = time.perf_counter()
+
+        for index, domain in pending_domains:
+            verdicts[index] = self._check_domain(domain)
+        domain_done = time.perf_counter()
+
+        self.stats['timings']['syntax'] += syntax_done - start
+        self.stats['timings']['domain'] += domain_done - syntax_done
+        return verdicts
+
+    def filter_rows(self, rows: Iterable[Dict], field: str = 'email') -> Iterator[Dict]:
+        """
+        Yield only rows with a valid address; rejected rows are counted and quarantined.
+
+        Rows are validated chunk_size at a time, so this works on streams.
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield from self._filter_chunk(chunk, field)
+                chunk = []
+        if chunk:
+            yield from self._filter_chunk(chunk, field)
+
+    def _filter_chunk(self, chunk: List[Dict], field: str) -> List[Dict]:
+        """Validate one chunk of rows and return the valid ones"""
+        verdicts = self.validate([row.get(field) or '' for row in chunk])
+        valid = []
+        for row, reason in zip(chunk, verdicts):
+            if reason is None:
+                valid.append(row)
+            else:
+                self._reject(row, reason)
+        self.stats['valid'] += len(valid)
+        return valid
+
+    def _reject(self, row: Dict, reason: str):
+        """Count a rejected row and write it to the quarantine file"""
+        self.stats['invalid'] += 1
+        self.stats['reasons'][reason] = self.stats['reasons'].get(reason, 0) + 1
+
+        if not self.quarantine_path:
+            return
+        start = time.perf_counter()
+        if self._quarantine_writer is None:
+            self._quarantine_file = open(self.quarantine_path, 'w', encoding='utf-8', newline='')
+            fieldnames = list(row.keys()) + ['rejection_reason']
+            self._quarantine_writer = csv.DictWriter(self._quarantine_file, fieldnames=fieldnames,
+                                                     extrasaction='ignore')
+            self._quarantine_writer.writeheader()
+        self._quarantine_writer.writerow(dict(row, rejection_reason=reason))
+        self.stats['timings']['quarantine'] += time.perf_counter() - start
+
+    def report(self) -> str:
+        """One-line summary of counts and time spent per stage"""
+        timings = self.stats['timings']
+        reasons = ', '.join(f"{reason}: {count}" for reason, count in sorted(self.stats['reasons'].items()))
+        return (f"{self.stats['valid']} valid, {self.stats['invalid']} invalid ({reasons or 'none'}); "
+                f"{self.stats['domains_checked']} domains checked, {self.stats['domain_cache_hits']} cache hits; "
+                f"syntax {timings['syntax']:.3f}s, domain {timings['domain']:.3f}s, "
+                f"quarantine {timings['quarantine']:.3f}s")
+
+    def close(self):
+        """Close the quarantine file"""
+        if self._quarantine_file is not None:
+            self._quarantine_file.close()
+            self._quarantine_file = None
+            self._quarantine_writer = None
+            logging.info(f"Quarantined invalid addresses written to {self.quarantine_path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,292 @@
+"""
+Unsubscribe web service.
+
+Serves the unsubscribe page, the unsubscribe API (form, signed links and
+RFC 8058 one-click) and background subscriber imports. The subscriber store,
+the import job manager, the token signer and the one-click queue are created
+on first use, so importing the app doesn't touch the database.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import List
+
+from flask import Flask, request, jsonify, render_template
+
+from batch_email.emails import normalize_email
+from batch_email.import_jobs import ImportJobManager, requeue_interrupted
+from batch_email.store import local_db_path, open_store
+from batch_email.serving import run_production
+from batch_email.tokens import TokenSigner
+from batch_email.unsubscribe_queue import UnsubscribeQueue
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+app = Flask(__name__)
+
+_services = {}
+_services_lock = threading.RLock()  # factories may use other services
+
+
+def _service(name: str, factory):
+    """Return a shared service, creating it with factory() the first time it is needed"""
+    if name not in _services:
+        with _services_lock:
+            if name not in _services:
+                _services[name] = factory()
+    return _services[name]
+
+
+def get_store():
+    """
+    Subscriber store (SUBSCRIBER_STORE, default: local SQLite database).
+    Opening it creates the database or applies pending schema migrations.
+    """
+    return _service('store', open_store)
+
+
+def get_import_jobs() -> ImportJobManager:
+    """
+    Background import jobs (uploads are spooled to disk and imported by a worker thread).
+    Job progress is tracked in the local SQLite database; subscribers are written to the store.
+    Pending jobs are resumed by each server worker once it starts (see main() and gunicorn.conf.py)
+    """
+    return _service('import_jobs', lambda: ImportJobManager(
+        local_db_path(), os.environ.get('IMPORT_SPOOL_DIR', 'import_spool'), get_store()
+    ))
+
+
+def _create_token_signer():
+    token_signer = TokenSigner.from_env()
+    if token_signer is None:
+        logging.warning("UNSUBSCRIBE_SECRET is not set, signed unsubscribe links will be rejected")
+    return token_signer
+
+
+def get_token_signer():
+    """Verifies the signed tokens in unsubscribe links (UNSUBSCRIBE_SECRET, shared with the sender)"""
+    return _service('token_signer', _create_token_signer)
+
+
+def get_one_click_queue() -> UnsubscribeQueue:
+    """One-click unsubscribes are queued and written to the store in batches"""
+    return _service('one_click_queue', lambda: UnsubscribeQueue(
+        get_store(),
+        flush_interval=float(os.environ.get('ONE_CLICK_FLUSH_INTERVAL', '0.5'))
+    ))
+
+
+def shutdown():
+    """Write queued one-click unsubscribes (called when a server worker exits)"""
+    queue = _services.get('one_click_queue')
+    if queue is not None:
+        queue.close()
+
+
+def verify_token(token):
+    """Return the subscriber id a token was signed for, or None. Needs no database access."""
+    token_signer = get_token_signer()
+    if token_signer is None:
+        return None
+    return token_signer.verify(token)
+
+
+# Route for handling the unsubscribe form submission
+@app.route('/api/unsubscribe', methods=['POST'])
+def unsubscribe():
+    try:
+        store = get_store()
+        data = request.json
+        token = data.get('token')
+        email = normalize_email(data.get('email'))
+        reasons = data.get('reasons', [])
+        comments = data.get('comments', '')
+        preference = data.get('preference', 'unsubscribe-all')
+
+        if token:
+            # Signed link: reject forged tokens before touching the database
+            subscriber_id = verify_token(token)
+            if subscriber_id is None:
+                return jsonify({'success': False, 'message': 'Invalid unsubscribe link'}), 400
+            subscriber = store.get_subscriber_by_id(subscriber_id)
+            if subscriber is None:
+                return jsonify({'success': False, 'message': 'Email not found in our database'}), 404
+            email = subscriber['email']
+
+        elif not email:
+            return jsonify({'success': False, 'message': 'Email is required'}), 400
+
+        # Check if email exists
+        elif store.get_subscriber(email) is None:
+            return jsonify({'success': False, 'message': 'Email not found in our database'}), 404
+
+        # Update subscriber status based on preference
+        if preference == 'unsubscribe-all':
+            store.update_subscription(email, subscribed=False)
+        elif preference == 'less-frequent':
+            # In a real implementation, you would set a frequency preference
+            store.update_subscription(email)
+
+        # Store the unsubscribe reason
+        store.add_unsubscribe_reasons(email, reasons, comments, preference)
+
+        # Export to unsubscribe list CSV for reference
+        export_to_csv(email, reasons, comments, preference)
+
+        # Log the unsubscribe
+        logging.info(f"Unsubscribe request: {email}, Preference: {preference}, Reasons: {reasons}")
+
+        return jsonify({'success': True, 'message': 'Successfully unsubscribed'})
+
+    except Exception as e:
+        logging.error(f"Error processing unsubscribe: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+def export_to_csv(email, reasons, comments, preference):
+    """Export unsubscribe data to CSV for backup and reference"""
+    file_exists = os.path.isfile('unsubscribes.csv')
+
+    with open('unsubscribes.csv', 'a', newline='') as csvfile:
+        fieldnames = ['email', 'reasons', 'comments', 'preference', 'timestamp']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        if not file_exists:
+            writer.writeheader()
+
+        writer.writerow({
+            'email': email,
+            'reasons': ', '.join(reasons),
+            'comments': comments,
+            'preference': preference,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+
+# RFC 8058 one-click unsubscribe, posted by mail clients from the List-Unsubscribe header
+@app.route('/unsubscribe/one-click', methods=['POST'])
+def one_click_unsubscribe():
+    subscriber_id = verify_token(request.args.get('t'))
+    if subscriber_id is None:
+        return 'Invalid unsubscribe link', 400
+    if request.form.get('List-Unsubscribe') != 'One-Click':
+        return 'Expected List-Unsubscribe=One-Click', 400
+
+    # No page render and no synchronous write: the queue flushes in the background
+    get_one_click_queue().add(subscriber_id)
+    return '', 202
+
+
+def render_unsubscribe_page():
+    """
+    The unsubscribe page, rendered once per process.
+
+    The template has no variables (the page reads the email or token from its
+    own URL), so every request gets the same HTML.
+    """
+    return _service('unsubscribe_page', lambda: render_template('unsubscribe-page.html'))
+
+
+# Serve the unsubscribe page
+@app.route('/unsubscribe', methods=['GET'])
+def unsubscribe_page():
+    token = request.args.get('t')
+    # Forged or mangled links are turned away without a database hit
+    if token is not None and verify_token(token) is None:
+        return 'Invalid unsubscribe link', 400
+
+    return render_unsubscribe_page()
+
+
+# Route to check email status (if someone wants to confirm they're unsubscribed)
+@app.route('/api/check-status', methods=['GET'])
+def check_status():
+    email = normalize_email(request.args.get('email'))
+
+    if not email:
+        return jsonify({'subscribed': False, 'message': 'Email parameter is required'}), 400
+
+    result = get_store().lookup([email])
+
+    if email in result:
+        return jsonify({'subscribed': result[email]})
+    else:
+        return jsonify({'subscribed': False, 'message': 'Email not found in database'})
+
+
+# Import an existing email list (queued as a background job)
+@app.route('/api/import-subscribers', methods=['POST'])
+def import_subscribers():
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file provided'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'No file selected'}), 400
+
+    try:
+        job_id = get_import_jobs().submit(file, file.filename)
+        return jsonify({
+            'success': True,
+            'message': 'Import queued',
+            'job_id': job_id,
+            'status_url': f'/api/import-jobs/{job_id}'
+        }), 202
+
+    except Exception as e:
+        logging.error(f"Error importing subscribers: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+# List recent import jobs
+@app.route('/api/import-jobs', methods=['GET'])
+def list_import_jobs():
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'jobs': get_import_jobs().list_jobs(limit)})
+
+
+# Report progress (rows/sec and ETA) of an import job
+@app.route('/api/import-jobs/<job_id>', methods=['GET'])
+def import_job_status(job_id):
+    status = get_import_jobs().get_status(job_id)
+    if status is None:
+        return jsonify({'success': False, 'message': 'Import job not found'}), 404
+    return jsonify(status)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog='batch-email serve', description='Run the unsubscribe web service')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to bind to (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on (default: 5000)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: 2 x CPU cores + 1)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker (default: 4)')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='Seconds before a stuck worker is restarted (default: 30)')
+    parser.add_argument('--dev', action='store_true',
+                        help='Run the single-threaded Flask development server with the debugger')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, filename='unsubscribe_log.txt')
+
+    if args.dev:
+        get_import_jobs().requeue_interrupted()
+        get_import_jobs().resume_pending()
+        app.run(debug=True, host=args.host, port=args.port)
+    else:
+        run_production(
+            app,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            timeout=args.timeout,
+            # Runs in the gunicorn master: don't create the store there, workers are forked from it
+            on_starting=lambda: requeue_interrupted(local_db_path()),
+            on_worker_start=lambda: get_import_jobs().resume_pending()
+        )
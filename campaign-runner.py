@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Campaign Queue Runner
+--------------------
+Same as `batch-email campaign`; the implementation is in batch_email/campaign_runner.py.
+"""
+
+from batch_email.campaign_runner import main
+
+if __name__ == "__main__":
+    main()
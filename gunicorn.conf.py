@@ -0,0 +1,39 @@
+"""
+gunicorn settings for the unsubscribe service.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden with an environment variable. Send SIGHUP to
+the master process to gracefully reload workers after a deploy.
+"""
+
+import os
+
+from batch_email.serving import default_workers
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', default_workers()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = timeout
+accesslog = os.environ.get('WEB_ACCESS_LOG')
+
+
+def on_starting(server):
+    """Reset import jobs interrupted by a previous shutdown (runs once, in the master)"""
+    from batch_email.import_jobs import requeue_interrupted
+    from batch_email.store import local_db_path
+    # Only the job table is touched here; the store and job manager are created in each worker
+    requeue_interrupted(local_db_path())
+
+
+def post_worker_init(worker):
+    """Create the worker's store and import job manager and pick up jobs that were queued but never started"""
+    import wsgi
+    wsgi.get_import_jobs().resume_pending()
+
+
+def worker_exit(server, worker):
+    """Write queued one-click unsubscribes before the worker goes away"""
+    import wsgi
+    wsgi.shutdown()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Simple load test for the unsubscribe service.
+
+Measures requests/sec and latency for /unsubscribe and /api/check-status
+using concurrent keep-alive connections. Standard library only.
+
+    python load-test.py --url http://localhost:5000 --requests 5000 --concurrency 32
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlparse, quote
+
+
+def run_endpoint(base_url, path_template, emails, total_requests, concurrency):
+    """
+    Send total_requests GET requests to one endpoint from concurrency threads.
+
+    Returns:
+        Dict with request count, errors, elapsed time, requests/sec and latency percentiles
+    """
+    parsed = urlparse(base_url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            path = path_template.format(email=quote(emails[i % len(emails)]))
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    local_errors += 1
+            except Exception:
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+    return {
+        'requests': total_requests,
+        'errors': errors[0],
+        'elapsed': elapsed,
+        'rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the unsubscribe service')
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the service')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint (default: 2000)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent connections (default: 16)')
+    parser.add_argument('--distinct-emails', type=int, default=100,
+                        help='Number of distinct email addresses to cycle through (default: 100)')
+    
+    args = parser.parse_args()
+    
+    emails = [f"loadtest{i}@example.com" for i in range(args.distinct_emails)]
+    endpoints = [
+        ('/unsubscribe', '/unsubscribe?email={email}'),
+        ('/api/check-status', '/api/check-status?email={email}'),
+    ]
+    
+    print(f"Load testing {args.url} with {args.concurrency} connections, {args.requests} requests per endpoint")
+    print(f"{'endpoint':<20} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for name, path_template in endpoints:
+        stats = run_endpoint(args.url, path_template, emails, args.requests, args.concurrency)
+        print(f"{name:<20} {stats['rps']:>10.1f} {stats['p50_ms']:>10.2f} {stats['p99_ms']:>10.2f} {stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+The campaign runner must not lose rows to an SMTP outage, and must not send unthrottled.
+"""
+
+import csv
+
+import pytest
+
+from batch_email.campaigns import CampaignQueue, CampaignRunner, RateLimiter
+
+
+class FakeSender:
+    """Stands in for BatchEmailSender: records what send_rows was asked to send"""
+
+    def __init__(self):
+        self.up = True
+        self.sent = []
+
+    def send_rows(self, rows, *templates, batch_size=50, use_bcc=True, throttle=None, **options):
+        batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)] if use_bcc else [[row] for row in rows]
+        results = {'success': 0, 'failed': 0, 'skipped': 0}
+        for batch in batches:
+            throttle(len(batch))
+            if self.up:
+                self.sent.extend(row['email'] for row in batch)
+                results['success'] += len(batch)
+            else:
+                results['failed'] += len(batch)
+        return results
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def queue(tmp_path):
+    csv_path = tmp_path / 'recipients.csv'
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['email', 'first_name'])
+        writer.writerows((f'person{n}@example.com', f'P{n}') for n in range(10))
+    queue = CampaignQueue(str(tmp_path / 'campaigns.db'))
+    queue.csv_path = str(csv_path)
+    return queue
+
+
+def test_outage_retries_the_slice(queue):
+    campaign_id = queue.add(queue.csv_path, '<p>Hi {first_name}</p>', batch_size=2, validate=False)
+    sender = FakeSender()
+    runner = CampaignRunner(queue, sender, slice_size=4, delay=0)
+
+    sender.up = False
+    assert runner.run_once()
+    campaign = queue.get(campaign_id)
+    # Nothing is recorded and the campaign waits before retrying
+    assert (campaign['status'], campaign['rows_done'], campaign['failed']) == ('running', 0, 0)
+    assert queue.next_ready() is None
+
+    # The server is back: the same rows are sent once the retry delay has passed
+    sender.up = True
+    queue.set_status(campaign_id, 'running', start_at=None)
+    while runner.run_once():
+        pass
+    campaign = queue.get(campaign_id)
+    assert (campaign['status'], campaign['rows_done'], campaign['sent'], campaign['failed']) == ('completed', 10, 10, 0)
+    assert sender.sent == [f'person{n}@example.com' for n in range(10)]
+
+
+def test_partial_failures_are_recorded(queue):
+    campaign_id = queue.add(queue.csv_path, '<p>Hi</p>', validate=False)
+    sender = FakeSender()
+    # Some addresses rejected by the server: the slice still counts
+    sender.send_rows = lambda rows, *args, **kwargs: {'success': 6, 'failed': 4, 'skipped': 0}
+    runner = CampaignRunner(queue, sender, slice_size=10, delay=0)
+
+    runner.run_once()
+    campaign = queue.get(campaign_id)
+    assert (campaign['status'], campaign['rows_done'], campaign['sent'], campaign['failed']) == ('completed', 10, 6, 4)
+
+
+def paced_runner(queue, sender, **kwargs):
+    """A runner whose default delay sleeps on a fake clock"""
+    sleeps = []
+    now = [0.0]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    runner = CampaignRunner(queue, sender, slice_size=10, **kwargs)
+    if runner.pacer is not None:
+        runner.pacer = RateLimiter(runner.pacer.rate, burst=1, clock=lambda: now[0], sleep=sleep)
+    return runner, sleeps
+
+
+def test_unthrottled_campaigns_use_the_default_delay(queue):
+    queue.add(queue.csv_path, '<p>Hi</p>', batch_size=2, validate=False)
+    runner, sleeps = paced_runner(queue, FakeSender())
+    while runner.run_once():
+        pass
+    # Five BCC batches, one second apart
+    assert sleeps == [1.0] * 4
+
+
+def test_rate_limits_replace_the_default_delay(queue):
+    queue.add(queue.csv_path, '<p>Hi</p>', batch_size=2, validate=False, rate_limit=1000)
+    runner, sleeps = paced_runner(queue, FakeSender())
+    while runner.run_once():
+        pass
+    assert sleeps == []
+
+    queue.add(queue.csv_path, '<p>Hi</p>', batch_size=2, validate=False)
+    runner, sleeps = paced_runner(queue, FakeSender(), rate_limit=1000)
+    while runner.run_once():
+        pass
+    assert sleeps == []
@@ -0,0 +1,119 @@
+"""
+Compressed lists must read back exactly, across gzip members and zstd frames, and be written back compressed.
+"""
+
+import csv
+import gzip
+import io
+
+import pytest
+
+from batch_email.compression import READ_BUFFER_SIZE, _zstd, detect_compression, open_binary, open_text
+from batch_email.store import MemoryStore
+from batch_email.sync import update_original_csv
+
+
+def zstd_module():
+    """The zstd implementation the package would use, or skip the test without one"""
+    try:
+        return _zstd()
+    except RuntimeError:
+        pytest.skip("needs Python 3.14 or the zstandard package")
+
+
+def zstd_frame(data: bytes) -> bytes:
+    """Compress data into one complete zstd frame"""
+    zstd = zstd_module()
+    if hasattr(zstd.ZstdDecompressor, 'stream_reader'):
+        # zstandard
+        return zstd.ZstdCompressor().compress(data)
+    return zstd.compress(data)
+
+
+def csv_bytes(start: int, count: int, header: bool = False) -> bytes:
+    out = io.StringIO(newline='')
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(['email', 'first_name', 'last_name'])
+    writer.writerows((f'person{n}@example.com', f'Zoë{n}', f'Last, {n}') for n in range(start, start + count))
+    return out.getvalue().encode('utf-8')
+
+
+# Over READ_BUFFER_SIZE decompressed per part, so reads cross chunk boundaries
+ROWS_PER_PART = READ_BUFFER_SIZE // 30
+PARTS = [csv_bytes(0, ROWS_PER_PART, header=True), csv_bytes(ROWS_PER_PART, ROWS_PER_PART)]
+
+
+def read_all(path) -> bytes:
+    with open_binary(str(path)) as file:
+        return file.read()
+
+
+def test_plain_files_are_read_as_is(tmp_path):
+    path = tmp_path / 'list.csv'
+    path.write_bytes(b''.join(PARTS))
+    assert detect_compression(str(path)) is None
+    assert read_all(path) == b''.join(PARTS)
+
+
+def test_gzip_members_are_all_read(tmp_path):
+    # Concatenated files (cat a.gz b.gz) have one member each
+    path = tmp_path / 'list.csv.gz'
+    path.write_bytes(b''.join(gzip.compress(part) for part in PARTS))
+    assert detect_compression(str(path)) == 'gzip'
+    assert read_all(path) == b''.join(PARTS)
+
+
+def test_zstd_frames_are_all_read(tmp_path):
+    # Multi-threaded zstd and concatenated files have several frames
+    path = tmp_path / 'list.csv.zst'
+    path.write_bytes(b''.join(zstd_frame(part) for part in PARTS))
+    assert detect_compression(str(path)) == 'zstd'
+    assert read_all(path) == b''.join(PARTS)
+
+
+@pytest.mark.parametrize('name', ['list.csv.gz', 'list.csv.zst'])
+def test_text_round_trip(tmp_path, name):
+    if name.endswith('.zst'):
+        zstd_module()
+    path = str(tmp_path / name)
+    rows = [['email', 'notes'], ['a@example.com', 'comma, "quotes"'], ['zoë@example.com', 'line\nbreak']]
+    with open_text(path, 'w') as file:
+        csv.writer(file).writerows(rows)
+
+    # Recognized by contents, not by name
+    renamed = tmp_path / 'renamed.csv'
+    renamed.write_bytes(open(path, 'rb').read())
+    for candidate in (path, str(renamed)):
+        with open_text(candidate) as file:
+            assert list(csv.reader(file)) == rows
+
+
+def test_closing_early_releases_the_file(tmp_path):
+    path = tmp_path / 'list.csv.gz'
+    path.write_bytes(b''.join(gzip.compress(part) for part in PARTS))
+    with open_text(str(path)) as file:
+        assert next(csv.reader(file)) == ['email', 'first_name', 'last_name']
+    assert file.closed
+
+
+@pytest.mark.parametrize('name', ['list.csv.gz', 'list.csv.zst'])
+def test_update_writes_back_with_the_same_compression(tmp_path, name):
+    if name.endswith('.zst'):
+        zstd_module()
+    path = str(tmp_path / name)
+    with open_text(path, 'w') as file:
+        writer = csv.writer(file)
+        writer.writerow(['email', 'first_name', 'last_name'])
+        writer.writerows([['alice@example.com', 'Alice', ''], ['bob@example.com', 'Bob', '']])
+
+    store = MemoryStore()
+    store.upsert_subscribers([('alice@example.com', '', '')])
+    store.update_subscription('alice@example.com', False)
+    assert update_original_csv(path, store) == 1
+
+    assert detect_compression(path) == ('gzip' if name.endswith('.gz') else 'zstd')
+    with open_text(path) as file:
+        assert [(row['email'], row['subscribed']) for row in csv.DictReader(file)] == \
+            [('alice@example.com', '0'), ('bob@example.com', '1')]
+    assert store.lookup(['bob@example.com']) == {'bob@example.com': True}
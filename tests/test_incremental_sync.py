@@ -0,0 +1,211 @@
+"""
+An incremental --sync-all must leave a CSV exactly as a full rescan would.
+"""
+
+import csv
+import os
+import shutil
+
+import pytest
+
+from batch_email.store import SQLiteStore
+from batch_email.sync import sync_csv
+
+COLUMNS = ['email', 'first_name', 'last_name', 'company']
+
+
+def write_rows(path, rows, header=False):
+    with open(path, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+def people(start, count):
+    return [[f'Person{n}@Example.com', f'First{n}', f'Last{n}', f'Company, {n % 7}'] for n in range(start, start + count)]
+
+
+@pytest.fixture
+def synced(tmp_path):
+    """Two copies of a list, both synced once: one to sync incrementally, one to rescan"""
+    store = SQLiteStore(str(tmp_path / 'subscribers.db'))
+    incremental = tmp_path / 'incremental.csv'
+    full = tmp_path / 'full.csv'
+    write_rows(incremental, people(0, 200), header=True)
+    shutil.copyfile(incremental, full)
+    sync_csv(str(incremental), store)
+    sync_csv(str(full), store)
+    yield store, str(incremental), str(full)
+    store.close()
+
+
+def sync_both(store, incremental, full, capsys):
+    capsys.readouterr()
+    sync_csv(incremental, store)
+    output = capsys.readouterr().out
+    # The incremental path was taken, not the fallback rescan
+    assert 'appended rows' in output and 'rescanning' not in output
+    sync_csv(full, store, full=True)
+    with open(incremental, 'rb') as a, open(full, 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_appends_unsubscribes_and_resubscribes_match_full_sync(synced, capsys):
+    store, incremental, full = synced
+
+    # Appended rows, including an address already in the list and one that was unsubscribed
+    store.update_subscription('person3@example.com', False)
+    store.update_subscription('person4@example.com', False)
+    appended = people(200, 50) + [['PERSON3@example.com', 'Again', 'Three', ''], ['person10@example.com', '', '', '']]
+    write_rows(incremental, appended)
+    write_rows(full, appended)
+    sync_both(store, incremental, full, capsys)
+
+    # Unsubscribes of old and newly appended rows, a resubscribe, and more appended rows
+    store.update_subscription('person3@example.com', True)
+    store.update_subscription('person20@example.com', False)
+    store.update_subscription('person220@example.com', False)
+    appended = people(250, 10)
+    write_rows(incremental, appended)
+    write_rows(full, appended)
+    sync_both(store, incremental, full, capsys)
+
+    # Only status changes, nothing appended
+    store.update_subscription('person4@example.com', True)
+    store.update_subscription('person255@example.com', False)
+    sync_both(store, incremental, full, capsys)
+
+    with open(incremental, newline='', encoding='utf-8') as file:
+        status = {row['email'].lower(): row['subscribed'] for row in csv.DictReader(file)}
+    assert status['person3@example.com'] == '1'
+    assert status['person4@example.com'] == '1'
+    assert status['person20@example.com'] == '0'
+    assert status['person220@example.com'] == '0'
+    assert status['person255@example.com'] == '0'
+
+
+def test_interrupted_sync_keeps_appended_rows(synced, monkeypatch):
+    store, incremental, _ = synced
+    write_rows(incremental, people(200, 20))
+    with open(incremental, 'rb') as file:
+        before = file.read()
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    # Fail after the rewritten rows are written, before the file is replaced
+    monkeypatch.setattr('batch_email.sync.os.replace', fail)
+    with pytest.raises(OSError):
+        sync_csv(incremental, store)
+
+    with open(incremental, 'rb') as file:
+        assert file.read() == before
+    # The partial copy is cleaned up
+    assert not [name for name in os.listdir(os.path.dirname(incremental)) if name.endswith('.tmp')]
+
+
+def test_rows_written_by_the_last_sync_are_not_reread(synced, capsys, monkeypatch):
+    store, incremental, full = synced
+    changes = []
+    changed_since = store.changed_since
+
+    def spy(*args, **kwargs):
+        result = changed_since(*args, **kwargs)
+        changes.append(len(result))
+        return result
+
+    monkeypatch.setattr(store, 'changed_since', spy)
+
+    # Right after the full sync that imported all 200 rows, nothing has changed
+    sync_csv(incremental, store)
+    write_rows(incremental, people(200, 30))
+    sync_csv(incremental, store)
+    store.update_subscription('person7@example.com', False)
+    store.update_subscription('person210@example.com', False)
+    sync_csv(incremental, store)
+    assert changes == [0, 0, 2]
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_status_changes_are_rewritten_in_place(synced, capsys):
+    store, incremental, _ = synced
+    before = read_bytes(incremental)
+    inode = os.stat(incremental).st_ino
+
+    store.update_subscription('person5@example.com', False)
+    # A newer updated_at with the same status changes nothing
+    store.update_subscription('person6@example.com')
+    capsys.readouterr()
+    sync_csv(incremental, store)
+    output = capsys.readouterr().out
+    assert 'rescanning' not in output
+    assert 'Updated 1 changed rows' in output
+
+    after = read_bytes(incremental)
+    assert os.stat(incremental).st_ino == inode
+    assert len(after) == len(before)
+    changed = [index for index, (a, b) in enumerate(zip(before, after)) if a != b]
+    assert len(changed) == 1
+    assert (before[changed[0]:changed[0] + 1], after[changed[0]:changed[0] + 1]) == (b'1', b'0')
+    line = after[after.rindex(b'\n', 0, changed[0]) + 1:after.index(b'\n', changed[0])]
+    assert line.startswith(b'Person5@Example.com,')
+
+
+def edit_both(incremental, full, edit):
+    for path in (incremental, full):
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path, 'wb') as file:
+            file.write(edit(data))
+
+
+def rescan_matches_full_sync(store, incremental, full, capsys):
+    capsys.readouterr()
+    sync_csv(incremental, store)
+    assert 'was edited since the last sync, rescanning it' in capsys.readouterr().out
+    sync_csv(full, store, full=True)
+    assert read_bytes(incremental) == read_bytes(full)
+
+
+def test_edited_rows_trigger_a_rescan(synced, capsys):
+    store, incremental, full = synced
+    # Same size, different contents: the fingerprint no longer matches
+    edit_both(incremental, full, lambda data: data.replace(b'First3,', b'Third3,'))
+    store.update_subscription('person8@example.com', False)
+    rescan_matches_full_sync(store, incremental, full, capsys)
+    with open(incremental, newline='', encoding='utf-8') as file:
+        rows = {row['email']: row for row in csv.DictReader(file)}
+    assert rows['Person3@Example.com']['first_name'] == 'Third3'
+    assert rows['Person8@Example.com']['subscribed'] == '0'
+
+
+def test_shrunk_file_triggers_a_rescan(synced, capsys):
+    store, incremental, full = synced
+    edit_both(incremental, full, lambda data: data[:data.rindex(b'\n', 0, len(data) - 1) + 1])
+    rescan_matches_full_sync(store, incremental, full, capsys)
+
+
+def test_rows_moved_outside_the_fingerprint_trigger_a_rescan(tmp_path, capsys):
+    # Large enough that the middle of the file isn't covered by the fingerprint
+    store = SQLiteStore(str(tmp_path / 'subscribers.db'))
+    incremental = str(tmp_path / 'incremental.csv')
+    full = str(tmp_path / 'full.csv')
+    write_rows(incremental, people(0, 5000), header=True)
+    sync_csv(incremental, store)
+    assert os.path.getsize(incremental) > 4 * 64 * 1024
+    shutil.copyfile(incremental, full)
+
+    # Swap two rows of the same length in the middle, then change one of them
+    def swap(data):
+        first, second = b'Person2500@Example.com,First2500', b'Person2501@Example.com,First2501'
+        return data.replace(first, b'\0').replace(second, first).replace(b'\0', second)
+
+    edit_both(incremental, full, swap)
+    store.update_subscription('person2500@example.com', False)
+    rescan_matches_full_sync(store, incremental, full, capsys)
+    store.close()
@@ -0,0 +1,80 @@
+"""
+RFC 8058 one-click unsubscribes: fast accept/reject in the handler, batched writes to the store.
+"""
+
+import pytest
+
+pytest.importorskip('flask')
+
+from batch_email import web
+from batch_email.store import MemoryStore
+from batch_email.tokens import TokenSigner
+from batch_email.unsubscribe_queue import UnsubscribeQueue
+
+ONE_CLICK = {'List-Unsubscribe': 'One-Click'}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """The web app with an in-memory store and a queue that only writes when flushed"""
+    store = MemoryStore()
+    store.upsert_subscribers([('alice@example.com', 'Alice', ''), ('bob@example.com', 'Bob', '')])
+    queue = UnsubscribeQueue(store, flush_interval=3600)
+    monkeypatch.setattr(web, '_services', {
+        'store': store,
+        'token_signer': TokenSigner([b'secret']),
+        'one_click_queue': queue,
+    })
+    yield web.app.test_client(), store, queue
+    queue.close()
+
+
+def test_valid_token_is_accepted_and_written_on_flush(service):
+    client, store, queue = service
+    ids = store.get_subscriber_ids(['alice@example.com'])
+    token = TokenSigner([b'secret']).sign(ids['alice@example.com'])
+
+    response = client.post(f'/unsubscribe/one-click?t={token}', data=ONE_CLICK)
+    assert response.status_code == 202
+    # Repeated posts from the mail provider are harmless
+    assert client.post(f'/unsubscribe/one-click?t={token}', data=ONE_CLICK).status_code == 202
+
+    # Nothing is written until the queue flushes
+    assert store.lookup(['alice@example.com']) == {'alice@example.com': True}
+    assert queue.flush() == 1
+    assert store.lookup(['alice@example.com', 'bob@example.com']) == \
+        {'alice@example.com': False, 'bob@example.com': True}
+    assert [row['reason'] for row in store.unsubscribe_reasons] == ['one-click']
+
+
+@pytest.mark.parametrize('query', ['', '?t=', '?t=not-a-valid-token', '?t=AAAAAAAAAAAAAAAAAAAA'])
+def test_bad_or_missing_token_is_rejected(service, query):
+    client, store, queue = service
+    response = client.post(f'/unsubscribe/one-click{query}', data=ONE_CLICK)
+    assert 400 <= response.status_code < 500
+    assert queue.flush() == 0
+
+
+def test_forged_token_is_rejected(service):
+    client, store, queue = service
+    ids = store.get_subscriber_ids(['alice@example.com'])
+    token = TokenSigner([b'wrong secret']).sign(ids['alice@example.com'])
+    assert client.post(f'/unsubscribe/one-click?t={token}', data=ONE_CLICK).status_code == 400
+    assert queue.flush() == 0
+
+
+def test_missing_one_click_body_is_rejected(service):
+    client, store, queue = service
+    token = TokenSigner([b'secret']).sign(store.get_subscriber_ids(['bob@example.com'])['bob@example.com'])
+    assert client.post(f'/unsubscribe/one-click?t={token}').status_code == 400
+    assert client.get(f'/unsubscribe/one-click?t={token}').status_code == 405
+    assert queue.flush() == 0
+
+
+def test_close_writes_queued_unsubscribes(service):
+    client, store, queue = service
+    token = TokenSigner([b'secret']).sign(store.get_subscriber_ids(['bob@example.com'])['bob@example.com'])
+    assert client.post(f'/unsubscribe/one-click?t={token}', data=ONE_CLICK).status_code == 202
+
+    web.shutdown()
+    assert store.lookup(['bob@example.com']) == {'bob@example.com': False}
@@ -0,0 +1,84 @@
+"""
+A dry run reports what a send would cost without connecting to the SMTP server.
+"""
+
+import csv
+import smtplib
+
+import pytest
+
+from batch_email.planner import RECIPIENT_OVERHEAD, TRANSACTION_OVERHEAD
+from batch_email.sender import BatchEmailSender
+from batch_email.store import MemoryStore
+
+SENDER = 'me@example.com'
+HTML = '<p>Hello {first_name}, news from {company}.</p>'
+
+
+@pytest.fixture
+def dry_run(tmp_path, monkeypatch):
+    """Run a dry run over a small list; fails the test if an SMTP connection is opened"""
+    opened = []
+
+    def smtp(*args, **kwargs):
+        opened.append(args)
+        raise OSError("dry runs must not connect")
+
+    monkeypatch.setattr(smtplib, 'SMTP', smtp)
+    monkeypatch.delenv('UNSUBSCRIBE_SECRET', raising=False)
+
+    # One duplicate, one malformed and one unsubscribed address
+    rows = [
+        ('a@example.com', 'A'), ('b@example.com', 'B'), ('c@example.com', 'C'), ('A@Example.com', 'A again'),
+        ('not-an-address', 'Bad'), ('d@example.com', 'D'), ('e@example.com', 'E'), ('f@example.com', 'F'),
+    ]
+    csv_path = tmp_path / 'recipients.csv'
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['email', 'first_name', 'company'])
+        writer.writerows((email, name, 'Acme') for email, name in rows)
+
+    store = MemoryStore()
+    store.upsert_subscribers((email, name, '') for email, name in rows)
+    store.update_subscription('f@example.com', False)
+
+    def run(**options):
+        sender = BatchEmailSender('smtp.example.com', 587, SENDER, 'password', store=store)
+        return sender.send_batch_from_csv(str(csv_path), HTML, subject_template='News', dry_run=True,
+                                          delay=2, transaction_seconds=0.5, **options)
+
+    yield run
+    assert opened == []
+
+
+def envelope_bytes(transactions, recipients):
+    return (transactions * (TRANSACTION_OVERHEAD + len(SENDER))
+            + sum(RECIPIENT_OVERHEAD + len(address) for address in recipients))
+
+
+def test_bcc_dry_run(dry_run):
+    results = dry_run(batch_size=2, use_bcc=True)
+
+    # Batches [a, b], [c, d], [e, f]; f is unsubscribed
+    assert results['transactions'] == 3
+    assert results['recipients'] == 3 + 5  # each BCC message is also addressed to the sender
+    assert results['success'] == 5
+    assert (results['duplicates'], results['invalid'], results['skipped']) == (1, 1, 1)
+    # No delay after the last batch
+    assert results['estimated_seconds'] == 3 * 0.5 + 2 * 2
+    expected_recipients = [SENDER] * 3 + [f'{name}@example.com' for name in 'abcde']
+    assert results['bytes'] == results['message_bytes'] + envelope_bytes(3, expected_recipients)
+    assert results['message_bytes'] > 3 * len(HTML)
+
+
+def test_individual_dry_run(dry_run):
+    results = dry_run(use_bcc=False)
+
+    assert results['transactions'] == 5
+    assert results['recipients'] == 5
+    assert results['success'] == 5
+    assert results['skipped'] == 1
+    # Individual sends sleep after every email
+    assert results['estimated_seconds'] == 5 * 0.5 + 5 * 2
+    expected_recipients = [f'{name}@example.com' for name in 'abcde']
+    assert results['bytes'] == results['message_bytes'] + envelope_bytes(5, expected_recipients)
@@ -0,0 +1,121 @@
+"""
+A compiled recipient file must give back exactly the rows of the CSV it was compiled from.
+"""
+
+import csv
+
+import pytest
+
+from batch_email.recipient_file import ROWS_PER_CHUNK, RecipientFile, is_recipient_file, load_rows
+from batch_email.store import MemoryStore
+from batch_email.sync import compile_csv, filter_unsubscribed, import_from_csv, update_original_csv
+
+COLUMNS = ['email', 'first_name', 'last_name', 'notes', 'subscribed']
+
+
+@pytest.fixture
+def compiled(tmp_path):
+    """A CSV with awkward values, and its compiled recipient file"""
+    rows = [
+        {'email': 'alice@example.com', 'first_name': 'Alice', 'last_name': 'Smith', 'notes': 'plain', 'subscribed': '1'},
+        {'email': 'Bob@Example.com', 'first_name': 'Bob', 'last_name': '', 'notes': 'comma, "quotes"', 'subscribed': '0'},
+        {'email': 'zoë@example.com', 'first_name': 'Zoë', 'last_name': 'Łukasz', 'notes': 'line\nbreak', 'subscribed': '1'},
+        {'email': '', 'first_name': '', 'last_name': '', 'notes': 'no address', 'subscribed': 'no'},
+        {'email': 'nul@example.com', 'first_name': 'N', 'last_name': 'U', 'notes': 'a\0b', 'subscribed': ''},
+    ]
+    csv_path = tmp_path / 'recipients.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    brf_path = str(tmp_path / 'recipients.brf')
+    assert compile_csv(str(csv_path), brf_path) == len(rows)
+    return rows, str(csv_path), brf_path
+
+
+def test_round_trip(compiled):
+    rows, csv_path, brf_path = compiled
+    assert is_recipient_file(brf_path)
+    assert not is_recipient_file(csv_path)
+
+    assert load_rows(brf_path) == (COLUMNS, rows)
+    assert load_rows(brf_path) == load_rows(csv_path)
+
+    with RecipientFile(brf_path) as recipients:
+        assert len(recipients) == len(rows)
+        assert recipients.row(2) == rows[2]
+        assert recipients.value(4, 'notes') == 'a\0b'
+        assert bytes(recipients.raw(2, 'first_name')) == 'Zoë'.encode('utf-8')
+        assert list(recipients.column('email', 1, 3)) == ['Bob@Example.com', 'zoë@example.com']
+        assert list(recipients.rows(3)) == rows[3:]
+        assert [recipients.shard(number, 2) for number in range(2)] == [(0, 3), (3, 5)]
+        # The 'subscribed' column sets the bitmap; blank counts as subscribed
+        assert list(recipients.subscribed_rows()) == [0, 2, 4]
+        with pytest.raises(IndexError):
+            recipients.row(len(rows))
+
+
+def test_large_files_read_in_chunks(tmp_path):
+    count = ROWS_PER_CHUNK + 10
+    csv_path = tmp_path / 'large.csv'
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['email'])
+        writer.writerows([f'person{n}@example.com'] for n in range(count))
+    brf_path = str(tmp_path / 'large.brf')
+    compile_csv(str(csv_path), brf_path)
+
+    with RecipientFile(brf_path) as recipients:
+        emails = list(recipients.column('email'))
+        assert len(emails) == count
+        assert emails[ROWS_PER_CHUNK - 1:ROWS_PER_CHUNK + 1] == \
+            [f'person{ROWS_PER_CHUNK - 1}@example.com', f'person{ROWS_PER_CHUNK}@example.com']
+
+
+def test_statuses_from_the_store(compiled, tmp_path):
+    rows, csv_path, _ = compiled
+    store = MemoryStore()
+    store.upsert_subscribers([('alice@example.com', '', ''), ('bob@example.com', '', '')])
+    store.update_subscription('alice@example.com', False)
+
+    brf_path = str(tmp_path / 'from-store.brf')
+    compile_csv(csv_path, brf_path, store)
+    with RecipientFile(brf_path) as recipients:
+        # The store overrides the column; addresses it doesn't know count as subscribed
+        assert list(recipients.subscribed_rows()) == [1, 2, 3, 4]
+
+
+def test_update_refreshes_the_bitmap_in_place(compiled, capsys):
+    rows, _, brf_path = compiled
+    store = MemoryStore()
+    store.upsert_subscribers([('alice@example.com', 'Alice', 'Smith'), ('bob@example.com', 'Bob', '')])
+    store.update_subscription('alice@example.com', False)
+
+    with open(brf_path, 'rb') as file:
+        before = file.read()
+    assert update_original_csv(brf_path, store) == 1
+
+    with RecipientFile(brf_path) as recipients:
+        assert list(recipients.subscribed_rows()) == [1, 2, 3, 4]
+        # Only the bitmap changed
+        assert list(recipients.rows()) == rows
+    with open(brf_path, 'rb') as file:
+        after = file.read()
+    assert len(after) == len(before)
+    assert sum(a != b for a, b in zip(before, after)) == 1
+
+    # Addresses the store didn't know were added as subscribers
+    assert store.lookup(['zoë@example.com', 'nul@example.com']) == {'zoë@example.com': True, 'nul@example.com': True}
+
+
+def test_commands_accept_compiled_files(compiled, tmp_path):
+    rows, _, brf_path = compiled
+    store = MemoryStore()
+    assert import_from_csv(brf_path, store) == 4
+    assert store.get_subscriber('bob@example.com')['first_name'] == 'Bob'
+
+    store.update_subscription('bob@example.com', False)
+    output = tmp_path / 'filtered.csv'
+    assert filter_unsubscribed(brf_path, str(output), store) == 1
+    with open(output, newline='', encoding='utf-8') as file:
+        assert [row['email'] for row in csv.DictReader(file)] == ['alice@example.com', 'zoë@example.com', 'nul@example.com']
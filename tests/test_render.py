@@ -0,0 +1,33 @@
+"""
+Cached rendering must match plain per-row formatting and reuse variants across rows.
+"""
+
+from batch_email.render import RenderCache
+
+HTML = ('<p>Hi {first_name}, news for {company}.</p>'
+        '<a href="https://example.com/unsubscribe?email={email}">Unsubscribe</a>')
+SUBJECT = 'Offers for {company}'
+
+
+def test_columns_the_templates_dont_use_share_a_variant():
+    cache = RenderCache(HTML, None, SUBJECT)
+    rows = [{'id': str(n), 'email': f'person{n}@example.com', 'first_name': f'P{n}', 'last_name': '',
+             'company': 'Acme' if n % 2 else 'Initech', 'subscribed': '1'} for n in range(100)]
+
+    for row in rows:
+        html, text, subject = cache.render(row, f"https://example.com/unsubscribe?t={row['id']}")
+        assert html == (f"<p>Hi {row['first_name']}, news for {row['company']}.</p>"
+                        f"<a href=\"https://example.com/unsubscribe?t={row['id']}\">Unsubscribe</a>")
+        assert text is None
+        assert subject == f"Offers for {row['company']}"
+
+    # One variant per company, however many ids there are
+    assert cache.misses == 2
+    assert cache.hits == 98
+
+
+def test_missing_placeholder_columns_are_left_alone():
+    cache = RenderCache(SUBJECT)
+    assert cache.render({'email': 'a@example.com'}, '')[0] == 'Offers for {company}'
+    assert cache.render({'email': 'b@example.com', 'company': ''}, '')[0] == 'Offers for '
+    assert cache.misses == 2
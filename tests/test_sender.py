@@ -0,0 +1,37 @@
+"""
+Counts of a send must survive an error part way through it.
+"""
+
+import csv
+
+from batch_email.sender import BatchEmailSender
+from batch_email.store import MemoryStore
+
+
+def test_error_mid_send_keeps_the_counts(tmp_path, monkeypatch):
+    monkeypatch.delenv('UNSUBSCRIBE_SECRET', raising=False)
+    csv_path = tmp_path / 'recipients.csv'
+    emails = [f'person{n}@example.com' for n in range(10)]
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['email'])
+        writer.writerows([email] for email in emails)
+    store = MemoryStore()
+    store.upsert_subscribers((email, '', '') for email in emails)
+
+    sender = BatchEmailSender('smtp.example.com', 587, 'me@example.com', 'password', store=store)
+    sent = []
+
+    def send_email(recipient, subject, body_html, body_text=None, bcc=None, *args):
+        if len(sent) == 2:
+            raise RuntimeError("connection reset")
+        sent.append(bcc)
+        return True
+
+    monkeypatch.setattr(sender, 'connect', lambda: True)
+    monkeypatch.setattr(sender, 'send_email', send_email)
+    results = sender.send_batch_from_csv(str(csv_path), '<p>Hi</p>', batch_size=3, delay=0)
+
+    # Two batches of three went out before the error
+    assert results['success'] == 6
+    assert results['failed'] == 0
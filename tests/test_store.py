@@ -0,0 +1,95 @@
+"""
+Every subscriber store backend must behave the same way.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from batch_email.sender import BatchEmailSender
+from batch_email.store import MemoryStore, SQLiteStore, SubscriberStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryStore()
+    else:
+        store = SQLiteStore(str(tmp_path / 'subscribers.db'))
+    yield store
+    store.close()
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        SubscriberStore()
+
+
+def test_upsert_keeps_existing_subscribers(store):
+    assert store.upsert_subscribers([
+        (' Alice@Example.com ', 'Alice', 'Smith'),
+        ('bob@example.com', 'Bob', ''),
+        ('', 'Blank', ''),
+    ]) == 2
+    store.update_subscription('alice@example.com', False)
+
+    # Existing addresses (in any case) are left alone, including their status
+    assert store.upsert_subscribers([('ALICE@example.com', 'Other', 'Name'), ('carol@example.com', '', '')]) == 1
+
+    alice = store.get_subscriber('alice@example.com')
+    assert (alice['first_name'], alice['last_name'], alice['subscribed']) == ('Alice', 'Smith', False)
+    assert store.get_subscriber_by_id(alice['id'])['email'] == 'alice@example.com'
+    assert store.get_subscriber('nobody@example.com') is None
+    assert set(store.get_subscriber_ids(['Bob@example.com', 'carol@example.com', 'nobody@example.com'])) == \
+        {'bob@example.com', 'carol@example.com'}
+
+
+def test_check_unsubscribed(store):
+    store.upsert_subscribers([('alice@example.com', '', ''), ('bob@example.com', '', '')])
+    store.update_subscription('Bob@Example.com', False)
+
+    assert store.lookup(['ALICE@example.com', 'bob@example.com', 'nobody@example.com']) == \
+        {'alice@example.com': True, 'bob@example.com': False}
+
+    # The sender treats unknown addresses as unsubscribed
+    sender = BatchEmailSender('smtp.example.com', 587, 'me@example.com', 'password', store=store)
+    assert sender.check_subscription_status(['Alice@example.com', 'bob@example.com', 'nobody@example.com']) == \
+        {'Alice@example.com': True, 'bob@example.com': False, 'nobody@example.com': False}
+    assert sender.filter_unsubscribed(['Alice@example.com', 'bob@example.com']) == ['Alice@example.com']
+
+
+def test_changed_since(store):
+    store.upsert_subscribers([('alice@example.com', '', ''), ('bob@example.com', '', '')])
+    time.sleep(0.01)
+    since = datetime.now()
+    assert store.changed_since(since) == {}
+
+    store.update_subscription('bob@example.com', False)
+    assert store.update_subscription('nobody@example.com', False) is False
+    assert store.changed_since(since) == {'bob@example.com': False}
+    assert store.changed_since(since - timedelta(hours=1)) == {'alice@example.com': True, 'bob@example.com': False}
+
+    # Subscribers only added since are left out on request
+    store.upsert_subscribers([('carol@example.com', '', '')])
+    assert store.changed_since(since, include_new=False) == {'bob@example.com': False}
+    assert store.changed_since(since) == {'bob@example.com': False, 'carol@example.com': True}
+
+
+def test_unsubscribe(store):
+    store.upsert_subscribers([('alice@example.com', '', ''), ('bob@example.com', '', '')])
+    ids = store.get_subscriber_ids(['alice@example.com', 'bob@example.com'])
+
+    assert store.unsubscribe_ids([ids['alice@example.com'], ids['alice@example.com'], 999999], 'one-click') == 1
+    # Already unsubscribed: nothing changes
+    assert store.unsubscribe_ids([ids['alice@example.com']], 'one-click') == 0
+    assert store.lookup(['alice@example.com', 'bob@example.com']) == \
+        {'alice@example.com': False, 'bob@example.com': True}
+
+    store.add_unsubscribe_reasons('Bob@example.com', ['too-frequent', 'not-relevant'], 'No thanks', 'unsubscribe-all')
+    assert store.update_subscription('bob@example.com', False)
+    assert store.get_subscriber('bob@example.com')['subscribed'] is False
+
+    # Resubscribing flips the status back
+    assert store.update_subscription('alice@example.com', True)
+    assert store.lookup(['alice@example.com']) == {'alice@example.com': True}
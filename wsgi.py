@@ -0,0 +1,17 @@
+"""
+WSGI entry point for the unsubscribe service.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is defined in batch_email/web.py; its database connections are opened
+on the first request, in each worker.
+"""
+
+import logging
+
+from batch_email.web import LOG_FORMAT, app, get_import_jobs, shutdown
+
+# get_import_jobs and shutdown are used by the hooks in gunicorn.conf.py
+__all__ = ['app', 'get_import_jobs', 'shutdown']
+
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, filename='unsubscribe_log.txt')